@@ -10,12 +10,18 @@ function! deoplete#custom#_init() abort
   let s:custom.source._ = {}
   let s:custom.option = deoplete#init#_option()
   let s:custom.filter = {}
+  " Note: The versions must not be reset.  The Python side compares them
+  " with the cached versions.
+  let s:custom_version = get(s:, 'custom_version', 0) + 1
+  let s:custom_snapshot = deepcopy(s:custom)
 
+  let cached_version = exists('s:cached') ? s:cached.version + 1 : 0
   let s:cached = {}
   let s:cached.option = {}
   let s:cached.filter = {}
   let s:cached.buffer_option = {}
   let s:cached.source_vars = {}
+  let s:cached.version = cached_version
 endfunction
 function! deoplete#custom#_init_buffer() abort
   let b:deoplete_custom = {}
@@ -31,8 +37,13 @@ function! deoplete#custom#_update_cache() abort
 
   let custom_buffer = deoplete#custom#_get_buffer()
 
-  let s:cached.option = copy(s:custom.option)
-  let s:cached.buffer_option = copy(custom_buffer.option)
+  let prev_option = s:cached.option
+  let prev_buffer_option = s:cached.buffer_option
+
+  " Note: The nested dicts are changed in place by s:set_value().  They must
+  " be copied to detect the changes.
+  let s:cached.option = deepcopy(s:custom.option)
+  let s:cached.buffer_option = deepcopy(custom_buffer.option)
   call extend(s:cached.option, s:cached.buffer_option)
 
   let s:cached.source_vars = {}
@@ -55,6 +66,14 @@ function! deoplete#custom#_update_cache() abort
     endif
     call extend(s:cached.filter[name], vars)
   endfor
+
+  if prev_option !=# s:cached.option
+        \ || prev_buffer_option !=# s:cached.buffer_option
+    " Push the new options snapshot to the Python side
+    let s:cached.version += 1
+    call deoplete#util#rpcnotify('deoplete_set_options',
+          \ deoplete#custom#_get_options())
+  endif
 endfunction
 
 function! deoplete#custom#_get() abort
@@ -64,6 +83,20 @@ function! deoplete#custom#_get() abort
 
   return s:custom
 endfunction
+function! deoplete#custom#_get_version() abort
+  if !exists('s:custom')
+    call deoplete#custom#_init()
+  endif
+
+  " Note: The custom dicts may be changed in place.  The changes are
+  " detected by the snapshot.
+  if s:custom !=# s:custom_snapshot
+    let s:custom_version += 1
+    let s:custom_snapshot = deepcopy(s:custom)
+  endif
+
+  return s:custom_version
+endfunction
 function! deoplete#custom#_get_buffer() abort
   if !exists('b:deoplete_custom')
     call deoplete#custom#_init_buffer()
@@ -81,6 +114,13 @@ function! deoplete#custom#_get_source(source_name) abort
 
   return custom[a:source_name]
 endfunction
+function! deoplete#custom#_get_options() abort
+  return {
+        \ 'version': s:cached.version,
+        \ 'option': s:cached.option,
+        \ 'buffer_option': s:cached.buffer_option,
+        \ }
+endfunction
 function! deoplete#custom#_get_option(name) abort
   return s:cached.option[a:name]
 endfunction
@@ -46,7 +46,8 @@ endfunction
 function! deoplete#handler#_do_complete() abort
   let context = g:deoplete#_context
   let event = get(context, 'event', '')
-  if s:is_exiting() || v:insertmode !=# 'i' || s:check_input_method()
+  if s:is_exiting() || v:insertmode !=# 'i' || mode() !=# 'i'
+        \ || s:check_input_method()
         \ || !has_key(context, 'candidates')
     return
   endif
@@ -247,11 +247,14 @@ function! deoplete#init#_option() abort
         \ 'overwrite_completeopt': v:true,
         \ 'check_stderr': v:true,
         \ 'complete_suffix': v:true,
+        \ 'gather_timeout': 0,
         \ 'ignore_sources': {},
         \ 'keyword_patterns': {'_': '[a-zA-Z_]\k*'},
+        \ 'lazy_gather': v:false,
         \ 'max_list': 500,
         \ 'min_pattern_length': 2,
         \ 'num_processes': 1,
+        \ 'num_threads': 1,
         \ 'nofile_complete_filetypes': ['denite-filter'],
         \ 'omni_patterns': {},
         \ 'on_insert_enter': v:true,
@@ -260,9 +263,11 @@ function! deoplete#init#_option() abort
         \ 'profile': v:false,
         \ 'refresh_always': v:true,
         \ 'refresh_backspace': v:true,
+        \ 'shared_memory_threshold': 0,
         \ 'skip_chars': ['(', ')'],
         \ 'skip_multibyte': v:false,
         \ 'sources': {},
+        \ 'spare_process': v:true,
         \ 'trigger_key': v:char,
         \ 'yarp': v:false,
         \ }
@@ -278,6 +283,99 @@ function! deoplete#init#_prev_completion() abort
         \ }
 endfunction
 
+function! deoplete#init#_context(
+      \ event, cached_filetype, custom_version) abort
+  " Note: It returns the whole completion context in one call.
+  " "keyword_pattern" and "sources" are added only if the filetype is
+  " different from "cached_filetype".
+  " "custom" is added only if the version is different from
+  " "custom_version".
+  let input = deoplete#util#get_input(a:event)
+
+  let bufnr = str2nr(expand('<abuf>'))
+  if !bufnr
+    let bufnr = bufnr('%')
+  endif
+  let bufname = bufnr > 0 ? bufname(bufnr) : ''
+  if bufnr <= 0
+    let bufnr = -1
+  endif
+
+  let [filetype, filetypes, same_filetypes] =
+        \ s:get_context_filetype(a:event, &l:filetype)
+
+  let context = {
+        \ 'bufnr': bufnr,
+        \ 'bufname': bufname,
+        \ 'buftype': &l:buftype,
+        \ 'changedtick': b:changedtick,
+        \ 'complete_str': '',
+        \ 'custom_version': deoplete#custom#_get_version(),
+        \ 'cwd': getcwd(),
+        \ 'encoding': &encoding,
+        \ 'event': a:event,
+        \ 'filetype': filetype,
+        \ 'filetypes': filetypes,
+        \ 'input': input,
+        \ 'is_windows': has('win32'),
+        \ 'max_width': winwidth(0) - col('.'),
+        \ 'next_input': getline('.')[len(input) :],
+        \ 'position': getpos('.'),
+        \ 'same_filetypes': same_filetypes,
+        \ 'time': reltime(),
+        \ }
+
+  if type(a:cached_filetype) != v:t_string
+        \ || filetype !=# a:cached_filetype
+    let context.keyword_pattern = deoplete#util#get_keyword_pattern(filetype)
+    let context.sources = deoplete#custom#_get_filetype_option(
+          \ 'sources', filetype, [])
+  endif
+
+  if a:custom_version != context.custom_version
+    let context.custom = deoplete#custom#_get()
+  endif
+
+  return context
+endfunction
+function! s:get_context_filetype(event, filetype) abort
+  if !exists('s:context_filetype')
+    let s:context_filetype = {}
+
+    " Force context_filetype call
+    silent! call context_filetype#get_filetype()
+  endif
+
+  let linenr = line('.')
+  let bufnr = bufnr('%')
+  if empty(s:context_filetype)
+        \ || s:context_filetype.prev_filetype !=# a:filetype
+        \ || s:context_filetype.line != linenr
+        \ || s:context_filetype.bufnr != bufnr
+        \ || a:event ==# 'InsertEnter'
+    let exists_context_filetype = exists('*context_filetype#get_filetype')
+    let s:context_filetype = {
+          \ 'line': linenr,
+          \ 'bufnr': bufnr,
+          \ 'prev_filetype': a:filetype,
+          \ 'filetype': exists_context_filetype ?
+          \   context_filetype#get_filetype() :
+          \   (a:filetype !=# '' ? a:filetype : 'nothing'),
+          \ 'filetypes': exists_context_filetype ?
+          \   context_filetype#get_filetypes() :
+          \   split(a:filetype, '\.'),
+          \ 'same_filetypes': exists_context_filetype ?
+          \   context_filetype#get_same_filetypes() : [],
+          \ }
+  endif
+
+  return [
+        \ s:context_filetype.filetype,
+        \ s:context_filetype.filetypes,
+        \ s:context_filetype.same_filetypes,
+        \ ]
+endfunction
+
 function! deoplete#init#_python_version_check() abort
   python3 << EOF
 import vim
@@ -220,3 +220,57 @@ function! deoplete#util#indent_current_line() abort
     call setpos('.', pos)
   endtry
 endfunction
+
+" Note: The changed line ranges are recorded for the buffer source.
+" The ranges are [first, last, new_last] like nvim_buf_attach().
+let s:buffer_changes = {}
+function! deoplete#util#_attach_buffer(bufnr) abort
+  if has('nvim')
+    return has('nvim-0.5') &&
+          \ luaeval('require("deoplete.buffer").attach(_A)', a:bufnr)
+  endif
+
+  if !has_key(s:buffer_changes, a:bufnr)
+        \ && listener_add(function('s:on_buffer_changed'), a:bufnr) <= 0
+    return v:false
+  endif
+  let s:buffer_changes[a:bufnr] = []
+  return v:true
+endfunction
+function! deoplete#util#_get_buffer_changes(bufnr) abort
+  if has('nvim')
+    return has('nvim-0.5') ?
+          \ luaeval('require("deoplete.buffer").get_changes(_A)', a:bufnr) :
+          \ -1
+  endif
+
+  if !has_key(s:buffer_changes, a:bufnr)
+    return -1
+  endif
+  call listener_flush(a:bufnr)
+  let changes = s:buffer_changes[a:bufnr]
+  let s:buffer_changes[a:bufnr] = []
+  return changes
+endfunction
+function! s:on_buffer_changed(bufnr, start, end, added, changes) abort
+  if !has_key(s:buffer_changes, a:bufnr)
+    return
+  endif
+  for change in a:changes
+    call add(s:buffer_changes[a:bufnr],
+          \ [change.lnum - 1, change.end - 1, change.end - 1 + change.added])
+  endfor
+endfunction
+function! deoplete#util#_get_buffer_size(bufnr) abort
+  " Note: It returns -1 if the size is unknown.
+  if has('nvim')
+    return nvim_buf_get_offset(a:bufnr, nvim_buf_line_count(a:bufnr))
+  endif
+
+  let winid = bufwinid(a:bufnr)
+  if winid < 0 || !exists('*win_execute')
+    return -1
+  endif
+  return str2nr(win_execute(winid,
+        \ "echon line2byte(line('$') + 1) - 1", 'silent'))
+endfunction
@@ -55,6 +55,32 @@ function! s:check_required_msgpack() abort
   endif
 endfunction
 
+function! s:check_placement() abort
+  let placement = get(g:, 'deoplete#_placement', {})
+  if empty(placement)
+    return
+  endif
+
+  let lines = ['Source placement (process: average gathering time/CPU):']
+  for name in sort(keys(placement))
+    let stat = placement[name]
+    call add(lines, printf('        - %s: %d (%.1fms/%.1fms)',
+          \ name, stat.process, stat.time * 1000.0, stat.cpu * 1000.0))
+  endfor
+  call s:report_info(join(lines, "\n"))
+endfunction
+
+function! s:check_cache() abort
+  let stats = get(g:, 'deoplete#_cache_stats', {})
+  if empty(stats)
+    return
+  endif
+
+  call s:report_info(printf(
+        \ 'Results cache: %d hits, %d misses, %d items, %d candidates',
+        \ stats.hits, stats.misses, stats.size, stats.weight))
+endfunction
+
 function! s:still_have_issues() abort
   let indentation = '        '
   call s:report_info("If you're still having problems, " .
@@ -74,6 +100,8 @@ function! health#deoplete#check() abort
   call s:check_timers()
   call s:check_required_python()
   call s:check_required_msgpack()
+  call s:check_placement()
+  call s:check_cache()
 
   call s:still_have_issues()
 endfunction
@@ -0,0 +1,62 @@
+-- ============================================================================
+-- FILE: buffer.lua
+-- AUTHOR: Shougo Matsushita <Shougo.Matsu at gmail.com>
+-- License: MIT license
+-- ============================================================================
+
+-- The changed line ranges of the attached buffers.
+-- The ranges are {first, last, new_last} like nvim_buf_attach() on_lines.
+
+local M = {}
+
+local changes = {}
+local tokens = {}
+
+function M.attach(bufnr)
+  if tokens[bufnr] ~= nil and changes[bufnr] ~= nil then
+    changes[bufnr] = {}
+    return true
+  end
+
+  -- Note: The previous attachment is detached by the next on_lines.
+  local token = {}
+  tokens[bufnr] = token
+  changes[bufnr] = {}
+  local attached = vim.api.nvim_buf_attach(bufnr, false, {
+    on_lines = function(_, buf, _, first, last, new_last)
+      if tokens[buf] ~= token then
+        return true
+      end
+      if changes[buf] ~= nil then
+        table.insert(changes[buf], {first, last, new_last})
+      end
+    end,
+    on_reload = function(_, buf)
+      if tokens[buf] == token then
+        changes[buf] = nil
+      end
+    end,
+    on_detach = function(_, buf)
+      if tokens[buf] == token then
+        tokens[buf] = nil
+        changes[buf] = nil
+      end
+    end,
+  })
+  if not attached then
+    tokens[bufnr] = nil
+    changes[bufnr] = nil
+  end
+  return attached
+end
+
+function M.get_changes(bufnr)
+  local ret = changes[bufnr]
+  if ret == nil then
+    return -1
+  end
+  changes[bufnr] = {}
+  return ret
+end
+
+return M
@@ -51,6 +51,10 @@ if hasattr(vim, 'plugin'):
         def on_event(self, context: Context) -> None:
             self._deoplete.on_event(context)
 
+        @vim.rpc_export('deoplete_set_options')  # type: ignore
+        def set_options(self, options: Context) -> None:
+            self._deoplete.set_options(options)
+
 
 if find_spec('yarp'):
 
@@ -70,3 +74,6 @@ if find_spec('yarp'):
 
     def deoplete_on_event(context: Context) -> None:
         global_deoplete.on_event(context)
+
+    def deoplete_set_options(options: Context) -> None:
+        global_deoplete.set_options(options)
@@ -19,6 +19,7 @@ class Base(LoggingMixin):
         self.name = 'base'
         self.description = ''
         self.vars: typing.Dict[str, typing.Any] = {}
+        self.is_monotonic = False
 
     def on_event(self, context: UserContext) -> None:
         pass
@@ -50,6 +50,8 @@ class Base(LoggingMixin):
         self.max_info_width = 200
         self.max_menu_width = 40
         self.max_candidates = 500
+        self.gather_timeout = 0
+        self.cache_keys: typing.List[str] = []
         self.matcher_key = ''
         self.dup = False
         self.ignore_case = False
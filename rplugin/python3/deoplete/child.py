@@ -5,20 +5,27 @@
 # ============================================================================
 
 from collections import defaultdict
+from concurrent import futures
+from functools import partial
 from pathlib import Path
 from pynvim import Nvim
 import copy
 import msgpack
 import re
+import shutil
 import sys
+import tempfile
+import threading
 import time
 import typing
 
 from deoplete import logger
+from deoplete.base.source import Base
 from deoplete.exceptions import SourceInitError
 from deoplete.util import (bytepos2charpos, charpos2bytepos, error, error_tb,
-                           import_plugin, get_custom, get_syn_names,
-                           convert2candidates, uniq_list_dict)
+                           import_plugin, get_custom, get_filetype_option,
+                           get_syn_names, convert2candidates, pack_candidates,
+                           uniq_list_dict, LRUCache)
 
 UserContext = typing.Dict[str, typing.Any]
 Candidates = typing.List[typing.Dict[str, typing.Any]]
@@ -36,9 +43,24 @@ class Child(logger.LoggingMixin):
         self._profile_flag = None
         self._profile_start_time = 0
         self._loaded_sources: typing.Dict[str, typing.Any] = {}
+        self._source_classes: typing.Dict[str, typing.Any] = {}
         self._loaded_filters: typing.Dict[str, typing.Any] = {}
         self._source_errors: typing.Dict[str, int] = defaultdict(int)
         self._prev_results: typing.Dict[str, Result] = {}
+        self._result_caches: typing.Dict[str, LRUCache] = {}
+        self._prev_matched: typing.Dict[str, typing.Dict[str, typing.Any]] = {}
+        self._options: UserContext = {'option': {}, 'buffer_option': {}}
+        self._executor: typing.Optional[futures.ThreadPoolExecutor] = None
+        self._num_threads = 1
+        self._is_process = False
+        self._is_late = False
+        self._running: typing.Dict[str, 'futures.Future[Result]'] = {}
+        self._deferred_events: typing.Dict[
+            str, typing.List[UserContext]] = defaultdict(list)
+        self._source_stats: typing.Dict[str, typing.Dict[str, typing.Any]] = {}
+        self._shared_dir = ''
+        self._context: UserContext = {}
+        self._shared_count = 0
         if msgpack.version < (1, 0, 0):
             self._packer = msgpack.Packer(
                 encoding='utf-8',
@@ -54,25 +76,54 @@ class Child(logger.LoggingMixin):
         self._ignore_sources: typing.List[typing.Any] = []
 
     def main_loop(self, stdout: typing.Any) -> None:
+        # Note: The threads are used only in the child process.
+        self._is_process = True
+
         while True:
             feed = sys.stdin.buffer.raw.read(102400)  # type: ignore
             if feed is None:
                 continue
             if feed == b'':
                 # EOF
+                if self._shared_dir:
+                    shutil.rmtree(self._shared_dir, ignore_errors=True)
                 return
 
             self._unpacker.feed(feed)
 
-            for child_in in self._unpacker:
+            child_ins = list(self._unpacker)
+            for child_in in child_ins:
+                # Note: The contexts must be decoded in order even if the
+                # request is skipped.
+                args = child_in['args']
+                if args and isinstance(args[0], dict) and 'delta' in args[0]:
+                    args[0] = self._decode_context(args[0])
+            superseded = self._get_superseded(child_ins)
+            for i, child_in in enumerate(child_ins):
                 name = child_in['name']
                 args = child_in['args']
                 queue_id = child_in['queue_id']
 
+                if i in superseded:
+                    self.debug('Skip superseded %s: %s',  # type: ignore
+                               name, queue_id)
+                    continue
+
                 ret = self.main(name, args, queue_id)
                 if ret:
                     self._write(stdout, ret)
-                    self._vim.call('deoplete#auto_complete', 'Update')
+
+    def _get_superseded(self, child_ins: typing.List[typing.Any]
+                        ) -> typing.Set[int]:
+        # Note: If the newer merge_results for the same buffer is already
+        # received, the older requests are stale.  They are not gathered.
+        latest: typing.Dict[int, int] = {}
+        for i, child_in in enumerate(child_ins):
+            if child_in['name'] == 'merge_results':
+                latest[child_in['args'][0]['bufnr']] = i
+        return {i for i, child_in in enumerate(child_ins)
+                if child_in['name'] == 'merge_results' and
+                latest[child_in['args'][0]['bufnr']] != i}
 
     def main(self, name: str, args: typing.List[typing.Any],
              queue_id: typing.Optional[int]) -> typing.Optional[
@@ -82,34 +133,84 @@ class Child(logger.LoggingMixin):
             self._enable_logging()
         elif name == 'add_source':
             self._add_source(args[0])
+        elif name == 'preload_source':
+            self._preload_source(args[0])
+        elif name == 'remove_source':
+            self._remove_source(args[0])
         elif name == 'add_filter':
             self._add_filter(args[0])
         elif name == 'set_source_attributes':
             self._set_source_attributes(args[0])
+        elif name == 'set_options':
+            self._set_options(args[0])
         elif name == 'on_event':
             self._on_event(args[0])
         elif name == 'merge_results':
             results = self._merge_results(args[0], queue_id)
+            threshold = self._get_option('shared_memory_threshold')
+            for result in results['merged_results']:
+                # Note: The candidates are counted before they are cut to
+                # "max_list".
+                num_candidates = result.pop('num_candidates')
+                result['candidates'] = pack_candidates(result['candidates'])
+                if (threshold > 0 and num_candidates >= threshold and
+                        isinstance(result['candidates'], dict)):
+                    result['candidates'] = self._write_shared(
+                        result['candidates'])
             if results['is_async'] or results['merged_results']:
                 ret = results
         return ret
 
+    def _decode_context(self, encoded: UserContext) -> UserContext:
+        context = dict(self._context)
+        context.update(encoded['delta'])
+        for key in encoded['removed']:
+            context.pop(key, None)
+        self._context = context
+        # Note: The context may be changed by the sources.
+        return dict(context)
+
     def _write(self, stdout: typing.Any, expr: typing.Any) -> None:
         stdout.buffer.write(self._packer.pack(expr))
         stdout.flush()
 
+    def _write_shared(self, packed: typing.Dict[str, typing.Any]
+                      ) -> typing.Dict[str, typing.Any]:
+        # Note: The large candidates are written to the shared memory.  Only
+        # the path is sent by the pipe.  The parent removes the file.
+        if not self._shared_dir:
+            self._shared_dir = tempfile.mkdtemp(
+                prefix='deoplete-',
+                dir='/dev/shm' if Path('/dev/shm').is_dir() else None)
+
+        self._shared_count += 1
+        path = Path(self._shared_dir).joinpath(str(self._shared_count))
+        path.write_bytes(self._packer.pack(packed))
+        return {
+            'format': packed['format'],
+            'shared': str(path),
+        }
+
     def _enable_logging(self) -> None:
         logging = self._vim.vars['deoplete#_logging']
         logger.setup(self._vim, logging['level'], logging['logfile'])
         self.is_debug_enabled = True
 
+    def _set_options(self, options: UserContext) -> None:
+        self._options = options
+
+    def _get_option(self, name: str) -> typing.Any:
+        return self._options['option'][name]
+
     def _add_source(self, path: str) -> None:
         # Resolve symbolic link
         path = str(Path(path).resolve())
 
         source = None
         try:
-            Source = import_plugin(path, 'source', 'Source')
+            Source = self._source_classes.pop(path, None)
+            if not Source:
+                Source = import_plugin(path, 'source', 'Source')
             if not Source:
                 return
 
@@ -133,6 +234,32 @@ class Child(logger.LoggingMixin):
                 self.debug(  # type: ignore
                     f'Loaded Source: {source.name} ({path})')
 
+    def _preload_source(self, path: str) -> None:
+        # Note: The spare process imports the sources in advance.
+        path = str(Path(path).resolve())
+        if path in self._source_classes:
+            return
+
+        try:
+            self._source_classes[path] = import_plugin(
+                path, 'source', 'Source')
+        except Exception:
+            error_tb(self._vim, 'Could not load source: %s' % path)
+
+    def _remove_source(self, name: str) -> None:
+        # Note: The source may be gathered in the thread.
+        running = self._running.get(name, None)
+        if running:
+            futures.wait([running])
+
+        for d in [self._sources, self._loaded_sources,
+                  self._prev_results, self._source_stats,
+                  self._result_caches, self._prev_matched,
+                  self._deferred_events]:
+            if name in d:
+                d.pop(name)
+        self.debug(f'Removed Source: {name}')  # type: ignore
+
     def _add_filter(self, path: str) -> None:
         # Resolve symbolic link
         path = str(Path(path).resolve())
@@ -167,55 +294,256 @@ class Child(logger.LoggingMixin):
     def _merge_results(self, context: UserContext,
                        queue_id: typing.Optional[int]) -> typing.Dict[
                            str, typing.Any]:
-        results = self._gather_results(context)
-
+        self._is_late = False
+        self._flush_events()
+        refresh = bool(self._get_option('refresh_always') and
+                       self._get_option('auto_complete'))
+        eskk_checked = False
+
+        max_list = self._get_option('max_list')
+        lazy = bool(self._get_option('lazy_gather') and max_list > 0)
+        ordered: typing.Generator[Result, None, None]
+        if lazy:
+            ordered = self._gather_results_lazy(context)
+        else:
+            ordered = (x for x in sorted(
+                self._gather_results(context),
+                key=lambda x: self._get_rank(context, x['source']),
+                reverse=True))
+
+        # Note: The results are merged in rank order like the core.  The
+        # candidates after "max_list" cannot be in the final list.  They
+        # are not sent and the sources after them are not converted.
+        budget = max_list
+        results = []
         merged_results = []
-        for result in [x for x in results
-                       if not self._is_skip(x['context'], x['source'])]:
-            candidates = self._get_candidates(
-                result, context['input'], context['next_input'])
+        for result in ordered:
+            results.append(result)
+            if self._is_skip(result['context'], result['source']):
+                continue
+
+            if max_list > 0 and budget <= 0:
+                if result['is_async']:
+                    self._gather_async_results(result, result['source'])
+                continue
+
+            if refresh and not eskk_checked:
+                refresh = not self._vim.call(
+                    'deoplete#util#check_eskk_phase_henkan')
+                eskk_checked = True
+
+            [candidates, num_candidates] = self._get_candidates(
+                result, context['input'], context['next_input'], refresh,
+                budget if max_list > 0 else 0)
             if candidates:
-                rank = get_custom(context['custom'],
-                                  result['source'].name, 'rank',
-                                  result['source'].rank)
+                budget -= len(candidates)
                 merged_results.append({
                     'complete_position': result['complete_position'],
                     'candidates': candidates,
-                    'rank': rank,
+                    'rank': self._get_rank(context, result['source']),
+                    'num_candidates': num_candidates,
                 })
 
-        is_async = len([x for x in results if x['is_async']]) > 0
+            if lazy and budget <= 0:
+                # The rest sources are gathered in the background.
+                ordered.close()
+                break
+
+        is_async = self._is_late or len(
+            [x for x in results if x['is_async']]) > 0
 
         return {
             'queue_id': queue_id,
             'is_async': is_async,
             'merged_results': merged_results,
+            'stats': self._source_stats,
         }
 
-    def _gather_results(self, context: UserContext) -> typing.List[Result]:
+    def _gather_results(self, context: UserContext
+                        ) -> typing.Iterator[Result]:
         # Note: self._vim.current.buffer may not work when Vim quit
         if context['changedtick'] != self._vim.eval('b:changedtick'):
-            return []
-        results = []
+            return
+        sources = [x[1] for x in self._itersource(context)]
+
+        num_threads = self._get_option('num_threads')
+        if num_threads > 1 and len(sources) > 1 and self._is_process:
+            yield from self._gather_results_threads(
+                context, sources, num_threads)
+            return
+
+        for source in sources:
+            result = self._gather_source(context, source)
+            if result:
+                yield result
 
-        for source in [x[1] for x in self._itersource(context)]:
-            try:
-                result = self._get_result(context, source)
-                if not result:
+    def _gather_results_lazy(self, context: UserContext
+                             ) -> typing.Generator[Result, None, None]:
+        # Note: self._vim.current.buffer may not work when Vim quit
+        if context['changedtick'] != self._vim.eval('b:changedtick'):
+            return
+        rest = sorted([x[1] for x in self._itersource(context)],
+                      key=lambda x: int(self._get_rank(context, x)),
+                      reverse=True)
+
+        try:
+            while rest:
+                source = rest.pop(0)
+                if source.name in self._running:
+                    # Note: It is gathered in the background.
+                    self._is_late = True
                     continue
+
+                result = self._gather_source(context, source)
+                if result:
+                    yield result
+        finally:
+            if rest:
+                self._gather_background(context, rest)
+
+    def _gather_background(self, context: UserContext,
+                           sources: typing.List[typing.Any]) -> None:
+        # Note: The threads are used only in the child process.
+        if not self._is_process:
+            return
+
+        num_threads = max(1, self._get_option('num_threads'))
+        if not self._executor or self._num_threads != num_threads:
+            self._init_executor(num_threads)
+
+        context = copy.copy(context)
+        if (any(x.disabled_syntaxes for x in sources) and
+                'syntax_names' not in context):
+            context['syntax_names'] = get_syn_names(self._vim)
+
+        for source in sources:
+            if source.name not in self._running:
+                self.debug('Gather in the background: %s',  # type: ignore
+                           source.name)
+                self._submit_source(context, source)
+
+    def _get_rank(self, context: UserContext, source: typing.Any) -> int:
+        return int(get_custom(context['custom'],
+                              source.name, 'rank', source.rank))
+
+    def _gather_results_threads(self, context: UserContext,
+                                sources: typing.List[typing.Any],
+                                num_threads: int
+                                ) -> typing.Iterator[Result]:
+        if not self._executor or self._num_threads != num_threads:
+            self._init_executor(num_threads)
+
+        # Note: It must be set before the threads start.
+        if (any(x.disabled_syntaxes for x in sources) and
+                'syntax_names' not in context):
+            context['syntax_names'] = get_syn_names(self._vim)
+
+        start = time.monotonic()
+        default_timeout = self._get_option('gather_timeout')
+        deadlines: typing.Dict['futures.Future[Result]', float] = {}
+        gathering: typing.Dict['futures.Future[Result]', typing.Any] = {}
+        previous: typing.Set['futures.Future[Result]'] = set()
+        for source in sources:
+            future = self._running.get(source.name, None)
+            if future:
+                # Note: The source is not reentrant.  The previous
+                # gathering is merged when it is finished.
+                self.debug('Still running: %s', source.name)  # type: ignore
+                previous.add(future)
+            else:
+                future = self._submit_source(context, source)
+            timeout = (source.gather_timeout if source.gather_timeout > 0
+                       else default_timeout)
+            deadlines[future] = (start + timeout / 1000.0
+                                 if timeout > 0 else float('inf'))
+            gathering[future] = source
+
+        pending = set(gathering)
+        while pending:
+            now = time.monotonic()
+            late = {x for x in pending if deadlines[x] <= now}
+            if late:
+                # Note: The late sources are still running.  They are
+                # merged by the next request.
+                self.debug('Timeout: %s',  # type: ignore
+                           [gathering[x].name for x in late])
+                self._is_late = True
+                pending -= late
+                if not pending:
+                    break
+
+            deadline = min(deadlines[x] for x in pending)
+            done, pending = futures.wait(
+                pending, timeout=(deadline - now
+                                  if deadline != float('inf') else None),
+                return_when=futures.FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                source = gathering[future]
+                if result and future in previous and (
+                        not self._use_previous_result(
+                            context, result, False, False)):
+                    # The late result is too old.  Gather again.
+                    new_future = self._submit_source(context, source)
+                    deadlines[new_future] = deadlines[future]
+                    gathering[new_future] = source
+                    pending.add(new_future)
+                elif result:
+                    yield result
+
+    def _submit_source(self, context: UserContext,
+                       source: typing.Any) -> 'futures.Future[Result]':
+        self._flush_events(source.name)
+        future = self._executor.submit(  # type: ignore
+            self._gather_source, context, source)
+        self._running[source.name] = future
+        future.add_done_callback(partial(self._on_gathered, source.name))
+        return future
+
+    def _on_gathered(self, name: str,
+                     future: 'futures.Future[Result]') -> None:
+        if self._running.get(name, None) is future:
+            self._running.pop(name)
+
+    def _gather_source(self, context: UserContext,
+                       source: typing.Any) -> Result:
+        try:
+            result = self._get_result(context, source)
+            if result:
                 self._prev_results[source.name] = result
-                results.append(result)
-            except Exception as exc:
-                self._handle_source_exception(source, exc)
+            return result
+        except Exception as exc:
+            self._handle_source_exception(source, exc)
+        return {}
 
-        return results
+    def _init_executor(self, num_threads: int) -> None:
+        if self._executor:
+            self._executor.shutdown(wait=False)
+        else:
+            # Note: pynvim is not thread safe.  The requests from the
+            # source threads must be serialized.
+            session = self._vim._session
+            request = session.request
+            lock = threading.RLock()
+
+            def locked_request(*args: typing.Any,
+                               **kwargs: typing.Any) -> typing.Any:
+                with lock:
+                    return request(*args, **kwargs)
+            session.request = locked_request
+
+        self._num_threads = num_threads
+        self._executor = futures.ThreadPoolExecutor(
+            max_workers=num_threads, thread_name_prefix='deoplete')
 
     def _get_result(self, context: UserContext,
                     source: typing.Any) -> Result:
         if source.disabled_syntaxes and 'syntax_names' not in context:
             context['syntax_names'] = get_syn_names(self._vim)
 
-        ctx = copy.deepcopy(context)
+        # Note: The context values are shared between sources.  Only the
+        # top-level keys are changed for each source.
+        ctx = copy.copy(context)
 
         charpos = source.get_complete_position(ctx)
         if charpos >= 0 and source.is_bytepos:
@@ -233,7 +561,7 @@ class Child(logger.LoggingMixin):
             # Skip
             return {}
 
-        if (source.name in self._prev_results and
+        if (not source.cache_keys and source.name in self._prev_results and
                 self._use_previous_result(
                     context, self._prev_results[source.name],
                     source.is_volatile, source.is_async)):
@@ -261,10 +589,21 @@ class Child(logger.LoggingMixin):
 
         self._set_context_case(source, ctx)
 
+        cache_key = self._get_cache_key(ctx, source)
+        if cache_key:
+            candidates = self._get_result_cache(source).get(cache_key)
+            if candidates is not None:
+                ctx['candidates'] = candidates
+                return self._make_result(source, ctx)
+
         # Gathering
         self._profile_start(ctx, source.name)
         ctx['vars'] = self._vim.vars
+        start_time = time.monotonic()
+        start_cpu = time.thread_time()
         ctx['candidates'] = source.gather_candidates(ctx)
+        self._update_stats(source, time.monotonic() - start_time,
+                           time.thread_time() - start_cpu)
         if ctx['is_async']:
             source.is_async = True
         ctx['vars'] = None
@@ -274,7 +613,12 @@ class Child(logger.LoggingMixin):
             return {}
 
         ctx['candidates'] = convert2candidates(ctx['candidates'])
+        if cache_key and not ctx['is_async']:
+            self._get_result_cache(source).put(cache_key, ctx['candidates'])
+
+        return self._make_result(source, ctx)
 
+    def _make_result(self, source: typing.Any, ctx: UserContext) -> Result:
         return {
             'name': source.name,
             'source': source,
@@ -282,11 +626,52 @@ class Child(logger.LoggingMixin):
             'is_async': ctx['is_async'],
             'prev_linenr': ctx['position'][1],
             'prev_input': ctx['input'],
+            'prev_prefix': re.sub(r'\w*$', '', ctx['input']),
             'input': ctx['input'],
             'complete_position': ctx['complete_position'],
             'candidates': ctx['candidates'],
         }
 
+    def _get_cache_key(self, context: UserContext,
+                       source: typing.Any) -> typing.Optional[typing.Tuple[
+                           str, ...]]:
+        """Get the key of the result cache from the source cache_keys.
+
+        "line" is the line number of the cursor.
+        """
+        if not source.cache_keys:
+            return None
+        return tuple(repr(context['position'][1] if x == 'line'
+                          else context.get(x, None))
+                     for x in source.cache_keys)
+
+    def _get_result_cache(self, source: typing.Any) -> LRUCache:
+        if source.name not in self._result_caches:
+            # Note: The weight is the number of the candidates.
+            self._result_caches[source.name] = LRUCache(
+                10, 100000,
+                lambda x: len(x) if isinstance(x, list) else 1)
+        return self._result_caches[source.name]
+
+    def _update_stats(self, source: typing.Any,
+                      elapsed: float, cpu: float) -> None:
+        # Note: The costs are smoothed.  A slow gathering is not a reason to
+        # move the source.
+        alpha = 0.2
+        stats = self._source_stats.get(source.name, None)
+        if not stats:
+            self._source_stats[source.name] = {
+                'path': getattr(source, 'path', ''),
+                # Note: The sources with on_event() keep the state by the
+                # events.  They cannot be moved to another process.
+                'is_movable': type(source).on_event is Base.on_event,
+                'count': 1, 'time': elapsed, 'cpu': cpu,
+            }
+            return
+        stats['count'] += 1
+        stats['time'] += alpha * (elapsed - stats['time'])
+        stats['cpu'] += alpha * (cpu - stats['cpu'])
+
     def _gather_async_results(self, result: Result,
                               source: typing.Any) -> None:
         try:
@@ -356,7 +741,14 @@ class Child(logger.LoggingMixin):
             error_tb(self._vim, 'Errors from: %s' % f)
 
     def _get_candidates(self, result: Result,
-                        context_input: str, next_input: str) -> Candidates:
+                        context_input: str, next_input: str,
+                        refresh: bool, max_list: int
+                        ) -> typing.Tuple[Candidates, int]:
+        """Filter the candidates of the source.
+
+        It returns the candidates and the number of them before they are
+        cut to max_list.
+        """
         source = result['source']
 
         # Gather async results
@@ -364,7 +756,7 @@ class Child(logger.LoggingMixin):
             self._gather_async_results(result, source)
 
         if not result['candidates']:
-            return []
+            return ([], 0)
 
         # Source context
         ctx = copy.copy(result['context'])
@@ -373,12 +765,18 @@ class Child(logger.LoggingMixin):
         ctx['next_input'] = next_input
         ctx['complete_str'] = context_input[ctx['char_position']:]
         ctx['is_sorted'] = False
+        ctx['max_candidates'] = source.max_candidates
+        ctx['max_list'] = self._get_option('max_list')
 
         self._set_context_case(source, ctx)
 
         # Match
         matchers = [self._filters[x] for x
                     in source.matchers if x in self._filters]
+        matched = self._get_prev_matched(result, ctx, matchers)
+        if matched is not None:
+            # Note: The previous matched candidates are narrowed.
+            ctx['candidates'] = matched
         if source.matcher_key != '':
             original_candidates = ctx['candidates']
             # Convert word key to matcher_key
@@ -392,6 +790,18 @@ class Child(logger.LoggingMixin):
             for candidate in original_candidates:
                 candidate['word'] = candidate['__save_word']
                 del candidate['__save_word']
+        if matchers and all(getattr(x, 'is_monotonic', False)
+                            for x in matchers):
+            self._prev_matched[source.name] = {
+                'candidates': result['candidates'],
+                'length': len(result['candidates']),
+                'complete_str': ctx['complete_str'],
+                'case': (ctx['ignorecase'], ctx['camelcase']),
+                'matchers': source.matchers,
+                'matched': ctx['candidates'],
+                'is_truncated': (0 < source.max_candidates <=
+                                 len(ctx['candidates'])),
+            }
 
         # Sort
         sorters = [self._filters[x] for x
@@ -399,15 +809,6 @@ class Child(logger.LoggingMixin):
         for f in sorters:
             self._process_filter(f, ctx, source.max_candidates)
 
-        # Note: converter may break candidates
-        ctx['candidates'] = copy.deepcopy(ctx['candidates'])
-
-        # Convert
-        converters = [self._filters[x] for x
-                      in source.converters if x in self._filters]
-        for f in converters:
-            self._process_filter(f, ctx, source.max_candidates)
-
         if (isinstance(ctx['candidates'], dict) and
                 'sorted_candidates' in ctx['candidates']):
             sorted_candidates = ctx['candidates']['sorted_candidates']
@@ -415,6 +816,18 @@ class Child(logger.LoggingMixin):
             for candidates in sorted_candidates:
                 ctx['candidates'] += candidates
 
+        # Note: converter may break candidates.
+        # The candidates are shared with the previous results, but the
+        # converters only overwrite the top-level keys.  So shallow copies
+        # are enough.
+        ctx['candidates'] = [copy.copy(x) for x in ctx['candidates']]
+
+        # Convert
+        converters = [self._filters[x] for x
+                      in source.converters if x in self._filters]
+        for f in converters:
+            self._process_filter(f, ctx, source.max_candidates)
+
         # On post filter
         if hasattr(source, 'on_post_filter'):
             ctx['candidates'] = source.on_post_filter(ctx)
@@ -422,21 +835,10 @@ class Child(logger.LoggingMixin):
         mark = source.mark + ' '
 
         # Check user mark set
-        user_mark = self._vim.call(
-            'deoplete#custom#_get_source', source.name).get('mark', '')
+        custom_source = ctx['custom']['source']
+        user_mark = custom_source.get(source.name, {}).get('mark', '')
         if user_mark == '':
-            user_mark = self._vim.call(
-                'deoplete#custom#_get_source', '_').get('mark', mark)
-
-        refresh = False
-        refresh_always = self._vim.call(
-            'deoplete#custom#_get_option', 'refresh_always')
-        auto_complete = self._vim.call(
-            'deoplete#custom#_get_option', 'auto_complete')
-        eskk_check = self._vim.call(
-            'deoplete#util#check_eskk_phase_henkan')
-        if refresh_always and auto_complete and not eskk_check:
-            refresh = True
+            user_mark = custom_source.get('_', {}).get('mark', mark)
 
         for candidate in ctx['candidates']:
             candidate['icase'] = 1
@@ -458,16 +860,43 @@ class Child(logger.LoggingMixin):
             ctx['candidates'] = uniq_list_dict(
                 ctx['candidates'])  # type: ignore
 
-        return list(ctx['candidates'])
+        # Note: The converters may reorder or remove the candidates.  So
+        # the candidates are cut after them.
+        num_candidates = len(ctx['candidates'])
+        if max_list > 0:
+            return (list(ctx['candidates'][: max_list]), num_candidates)
+        return (list(ctx['candidates']), num_candidates)
+
+    def _get_prev_matched(self, result: Result, context: UserContext,
+                          matchers: typing.List[typing.Any]
+                          ) -> typing.Optional[Candidates]:
+        """Get the previous matched candidates if they can be narrowed.
+
+        If the matchers are monotonic, the candidates matched with the
+        longer input are the subset of the previous matched candidates.
+        """
+        prev = self._prev_matched.get(result['name'], None)
+        if (not prev or not matchers or result['is_async'] or
+                prev['is_truncated'] or
+                prev['candidates'] is not result['candidates'] or
+                prev['length'] != len(result['candidates']) or
+                prev['matchers'] != result['source'].matchers or
+                prev['case'] != (context['ignorecase'],
+                                 context['camelcase']) or
+                not context['complete_str'].startswith(
+                    prev['complete_str']) or
+                not all(getattr(x, 'is_monotonic', False)
+                        for x in matchers)):
+            return None
+        return typing.cast(Candidates, prev['matched'])
 
     def _itersource(self, context: UserContext
                     ) -> typing.Generator[typing.Any, None, None]:
         filetypes = context['filetypes']
         ignore_sources = set(self._ignore_sources)
         for ft in filetypes:
-            ignore_sources.update(
-                self._vim.call('deoplete#custom#_get_filetype_option',
-                               'ignore_sources', ft, []))
+            ignore_sources.update(get_filetype_option(
+                self._options, 'ignore_sources', ft, []))
 
         for source_name, source in self._get_sources().items():
             if source.filetypes is None or (
@@ -503,8 +932,7 @@ class Child(logger.LoggingMixin):
             return
 
         if not self._profile_flag:
-            self._profile_flag = self._vim.call(
-                'deoplete#custom#_get_option', 'profile')
+            self._profile_flag = self._get_option('profile')
             if self._profile_flag:
                 return self._profile_start(context, name)
         elif self._profile_flag:
@@ -533,9 +961,9 @@ class Child(logger.LoggingMixin):
             # candidates.
             return False
         else:
-            return bool(re.sub(r'\w*$', '', context['input']) ==
-                        re.sub(r'\w*$', '', result['prev_input']) and
-                        context['input'].find(result['prev_input']) == 0)
+            return bool(context['input'].startswith(result['prev_input']) and
+                        re.sub(r'\w*$', '', context['input']) ==
+                        result['prev_prefix'])
 
     def _is_skip(self, context: UserContext, source: typing.Any) -> bool:
         if (context.get('syntax_names', []) and source.disabled_syntaxes
@@ -552,8 +980,7 @@ class Child(logger.LoggingMixin):
             if (input_pattern != '' and
                     re.search('(' + input_pattern + ')$', context['input'])):
                 return False
-        auto_complete_popup = self._vim.call(
-            'deoplete#custom#_get_option', 'auto_complete_popup')
+        auto_complete_popup = self._get_option('auto_complete_popup')
         if context['event'] == 'Manual' or auto_complete_popup == 'manual':
             return False
         return not (source.min_pattern_length <=
@@ -565,11 +992,13 @@ class Child(logger.LoggingMixin):
         Each item in `attrs` is the attribute name.
         """
         attrs = (
+            'cache_keys',
             'camel_case',
             'converters',
             'disabled_syntaxes',
             'dup',
             'filetypes',
+            'gather_timeout',
             'ignore_case',
             'input_pattern',
             'input_patterns',
@@ -589,6 +1018,7 @@ class Child(logger.LoggingMixin):
             'sorters',
         )
 
+        self._result_caches = {}
         for name, source in self._get_sources().items():
             self.debug('Set Source attributes: %s', name)  # type: ignore
 
@@ -613,25 +1043,55 @@ class Child(logger.LoggingMixin):
 
             # Default min_pattern_length
             if source.min_pattern_length < 0:
-                source.min_pattern_length = self._vim.call(
-                    'deoplete#custom#_get_option', 'min_pattern_length')
+                source.min_pattern_length = self._get_option(
+                    'min_pattern_length')
 
     def _on_event(self, context: UserContext) -> None:
+        # Note: The sources must not be called while gathering.  The events
+        # of the running sources are delivered before the next gathering
+        # instead of waiting for them.
+        self._flush_events()
+        running = set(self._running)
+
         event = context['event']
-        context['vars'] = self._vim.vars
         for source_name, source in self._itersource(context):
             if not source.events or event in source.events:
-                try:
-                    source.on_event(context)
-                except Exception as exc:
-                    error_tb(self._vim,
-                             f'Exception during {source.name}.on_event '
-                             'for event {!r}: {}'.format(event, exc))
+                if source_name in running:
+                    self.debug('Defer %s: %s',  # type: ignore
+                               event, source_name)
+                    self._deferred_events[source_name].append(
+                        copy.copy(context))
+                    continue
+                self._source_on_event(source, context)
 
+        context['vars'] = self._vim.vars
         for f in self._filters.values():
             f.on_event(context)
         context['vars'] = None
 
+    def _flush_events(self, name: str = '') -> None:
+        for source_name in ([name] if name else list(self._deferred_events)):
+            if (source_name not in self._deferred_events or
+                    source_name in self._running):
+                continue
+            source = self._sources.get(source_name, None)
+            for context in self._deferred_events.pop(source_name):
+                if source:
+                    self._source_on_event(source, context)
+
+    def _source_on_event(self, source: typing.Any,
+                         context: UserContext) -> None:
+        # Note: The cached results may be changed by the event.
+        self._result_caches.pop(source.name, None)
+        context['vars'] = self._vim.vars
+        try:
+            source.on_event(context)
+        except Exception as exc:
+            error_tb(self._vim,
+                     f'Exception during {source.name}.on_event '
+                     'for event {!r}: {}'.format(context['event'], exc))
+        context['vars'] = None
+
     def _get_sources(self) -> typing.Dict[str, typing.Any]:
         # Note: for the size change of "self._sources" error
         return copy.copy(self._sources)
@@ -6,13 +6,12 @@
 
 from pathlib import Path
 from pynvim import Nvim
-import copy
 import typing
 
 import deoplete.parent
 from deoplete import logger
 from deoplete.context import Context
-from deoplete.util import error, error_tb
+from deoplete.util import balance_loads, error, error_tb, LRUCache
 
 UserContext = typing.Dict[str, typing.Any]
 Candidates = typing.Dict[str, typing.Any]
@@ -26,16 +25,22 @@ class Deoplete(logger.LoggingMixin):
 
         self._vim = vim
         self._runtimepath = ''
-        self._custom: typing.Dict[str, typing.Dict[str, typing.Any]] = {}
+        self._custom_version = -1
         self._loaded_paths: typing.Set[str] = set()
-        self._prev_results: typing.Dict[int, Candidates] = {}
+        # Note: The results of the parents are cached for each input.
+        # The weight is the number of the candidates.
+        self._results_cache = LRUCache(
+            32, 50000, lambda x: sum(len(y['candidates'])
+                                     for z in x.values() for y in z))
         self._prev_input = ''
-        self._prev_next_input = ''
         self._context: typing.Optional[Context] = None
         self._parents: typing.List[Parent] = []
         self._parent_count = 0
-        self._max_parents = self._vim.call('deoplete#custom#_get_option',
-                                           'num_processes')
+        self._spare: typing.Optional[Parent] = None
+        self._num_restarts = 0
+        self._options: UserContext = self._vim.call(
+            'deoplete#custom#_get_options')
+        self._max_parents = self._get_option('num_processes')
 
         if self._max_parents != 1 and not hasattr(self._vim, 'loop'):
             msg = ('pynvim 0.3.0+ is required for %d parents. '
@@ -58,6 +63,17 @@ class Deoplete(logger.LoggingMixin):
         logger.setup(self._vim, logging['level'], logging['logfile'])
         self.is_debug_enabled = True
 
+    def set_options(self, options: UserContext) -> None:
+        if options['version'] == self._options['version']:
+            return
+
+        self.debug('set_options: version %d',  # type: ignore
+                   options['version'])
+        self._options = options
+        self._results_cache.clear()
+        for parent in self._get_parents():
+            parent.set_options(options)
+
     def init_context(self) -> None:
         self._context = Context(self._vim)
 
@@ -69,12 +85,13 @@ class Deoplete(logger.LoggingMixin):
     def completion_begin(self, user_context: UserContext) -> None:
         if not self._context:
             self.init_context()
-        else:
-            self._context._init_cached()
 
         context = self._context.get(user_context['event'])  # type: ignore
         context.update(user_context)
 
+        self._completion(context)
+
+    def _completion(self, context: UserContext) -> None:
         self.debug('completion_begin (%s): %r',  # type: ignore
                    context['event'], context['input'])
 
@@ -137,8 +154,6 @@ class Deoplete(logger.LoggingMixin):
 
         if not self._context:
             self.init_context()
-        else:
-            self._context._init_cached()
 
         context = self._context.get(user_context['event'])  # type: ignore
         context.update(user_context)
@@ -149,24 +164,54 @@ class Deoplete(logger.LoggingMixin):
 
         self._check_recache(context)
 
+        if context['event'] == 'InsertLeave':
+            self.debug('results cache: %s',  # type: ignore
+                       self._results_cache.get_stats())
+            self._vim.vars['deoplete#_cache_stats'] = (
+                self._results_cache.get_stats())
+            if len(self._parents) > 1:
+                # Note: The sources are moved while the user is not typing.
+                self._balance_sources(context)
+
+        # Note: The results cache is valid only in one insert session.  The
+        # buffer may be changed outside of insert mode.
+        self._results_cache.clear()
+
         for parent in self._parents:
             parent.on_event(context)
 
-    def _get_results(self, context: UserContext) -> typing.List[typing.Any]:
+    def _on_child_results(self) -> None:
+        # Note: It is called when the child process answers.  The results
+        # are published directly instead of the "Update" event from Vim.
+        if not self._context:
+            return
+
+        context = self._context.get('Update')
+        if context['input'] != self._prev_input:
+            # The input is changed.  The new request is already sent.
+            return
+
+        context['rpc'] = 'deoplete_auto_completion_begin'
+        self._completion(context)
+
+    def _get_results(self, context: UserContext,
+                     prev_results: typing.Dict[int, typing.Any]
+                     ) -> typing.List[typing.Any]:
         is_async = False
         needs_poll = False
         results: typing.List[Candidates] = []
         for cnt, parent in enumerate(self._parents):
-            if cnt in self._prev_results:
+            if cnt in prev_results:
                 # Use previous result
-                results += copy.deepcopy(
-                    self._prev_results[cnt])  # type: ignore
+                # Note: The previous results are not changed in
+                # _merge_results().  So it does not need copy.
+                results += prev_results[cnt]
             else:
                 result = parent.merge_results(context)
                 is_async = is_async or result[0]
                 needs_poll = needs_poll or result[1]
                 if not result[0]:
-                    self._prev_results[cnt] = result[2]
+                    prev_results[cnt] = result[2]
                 results += result[2]
         return [is_async, needs_poll, results]
 
@@ -177,60 +222,131 @@ class Deoplete(logger.LoggingMixin):
         # So it must be updated.
         async_check = len(self._parents) > 1 or (
             context['event'] != 'Async' and context['event'] != 'Update')
-        use_prev = (context['input'] == self._prev_input
-                    and context['next_input'] == self._prev_next_input
-                    and context['event'] != 'Manual'
-                    and async_check)
-        if not use_prev:
-            self._prev_results = {}
+        use_prev = context['event'] != 'Manual' and async_check
+
+        # Note: changedtick is not in the key.  It is changed by typing.
+        # The cache is cleared by the events instead.
+        key = (context['bufnr'], context['position'][1], context['input'],
+               context['next_input'], context['filetype'])
+        prev_results = self._results_cache.get(key) if use_prev else None
+        if prev_results is None:
+            prev_results = {}
 
         self._prev_input = context['input']
-        self._prev_next_input = context['next_input']
 
-        [is_async, needs_poll, results] = self._get_results(context)
+        [is_async, needs_poll, results] = self._get_results(
+            context, prev_results)
+        self._results_cache.put(key, prev_results)
 
         if not results:
             return (is_async, needs_poll, -1, [])
 
         complete_position = min(x['complete_position'] for x in results)
 
+        max_list = self._get_option('max_list')
         all_candidates: typing.List[Candidates] = []
         for result in sorted(results,
                              key=lambda x: int(x['rank']), reverse=True):
             candidates = result['candidates']
+            if max_list > 0:
+                if len(all_candidates) >= max_list:
+                    break
+                # Note: The candidates from the child process are decoded
+                # when they are accessed.
+                candidates = candidates[: max_list - len(all_candidates)]
+
             prefix = context['input'][
                 complete_position:result['complete_position']]
 
             if prefix != '':
-                for candidate in candidates:
-                    # Add prefix
-                    candidate['word'] = prefix + candidate['word']
+                # Add prefix
+                # Note: The candidates may be cached.  Copy on write.
+                candidates = [dict(x, word=prefix + x['word'])
+                              for x in candidates]
 
             all_candidates += candidates
 
-        # self.debug(candidates)
-        max_list = self._vim.call(
-            'deoplete#custom#_get_option', 'max_list')
-        if max_list > 0:
-            all_candidates = all_candidates[: max_list]
-
-        candidate_marks = self._vim.call(
-            'deoplete#custom#_get_option', 'candidate_marks')
+        candidate_marks = self._get_option('candidate_marks')
         if candidate_marks:
-            all_candidates = copy.deepcopy(all_candidates)
             for i, candidate in enumerate(all_candidates):
                 mark = (candidate_marks[i] if i < len(candidate_marks) and
                         candidate_marks[i] else ' ')
-                candidate['menu'] = mark + ' ' + candidate.get('menu', '')
+                all_candidates[i] = dict(
+                    candidate, menu=mark + ' ' + candidate.get('menu', ''))
 
         return (is_async, needs_poll, complete_position, all_candidates)
 
-    def _add_parent(self, parent_cls: typing.Callable[
-            [Nvim], Parent]) -> None:
-        parent = parent_cls(self._vim)
+    def _on_child_exit(self, parent: Parent) -> None:
+        # Note: The dead child is replaced by the spare process.  The
+        # sources and filters are registered again.
+        if parent is self._spare:
+            self._spare = None
+            return
+        if parent not in self._parents:
+            return
+
+        index = self._parents.index(parent)
+        self._num_restarts += 1
+        if self._num_restarts > 3:
+            error(self._vim, f'The child process {index} is exited. '
+                  'Too many crashes.  It is not restarted until Neovim is '
+                  'restarted.')
+            return
+        error(self._vim, f'The child process {index} is exited. '
+              'It is restarted.')
+
+        new_parent = self._spare if self._spare else self._new_parent(
+            deoplete.parent.AsyncParent)
+        self._spare = None
+        self._parents[index] = new_parent
+        self._results_cache.clear()
+
+        for path in self._find_rplugins('filter'):
+            new_parent.add_filter(str(path))
+        for source_path in parent.get_source_paths():
+            new_parent.add_source(source_path)
+        if self._context:
+            context = self._context.get('Init')
+            new_parent.set_source_attributes(context)
+            new_parent.on_event(context)
+
+        self._start_spare()
+
+    def _new_parent(self, parent_cls: typing.Callable[
+            [Nvim, typing.Callable[[], None],
+             typing.Callable[[Parent], None]], Parent]) -> Parent:
+        parent = parent_cls(self._vim, self._on_child_results,
+                            self._on_child_exit)
         if self._vim.vars['deoplete#_logging']:
             parent.enable_logging()
-        self._parents.append(parent)
+        parent.set_options(self._options)
+        return parent
+
+    def _add_parent(self, parent_cls: typing.Callable[
+            [Nvim, typing.Callable[[], None],
+             typing.Callable[[Parent], None]], Parent]) -> None:
+        self._parents.append(self._new_parent(parent_cls))
+
+    def _start_spare(self) -> None:
+        """Start the spare process to replace the dead child immediately.
+
+        The spare process imports all filters and sources in advance.
+        """
+        if (self._spare or self._max_parents == 1 or
+                not self._get_option('spare_process')):
+            return
+
+        self._spare = self._new_parent(deoplete.parent.AsyncParent)
+        for path in self._find_rplugins('filter'):
+            self._spare.add_filter(str(path))
+        for loaded_path in sorted(self._loaded_paths):
+            self._spare.preload_source(loaded_path)
+
+    def _get_parents(self) -> typing.List[Parent]:
+        return self._parents + ([self._spare] if self._spare else [])
+
+    def _get_option(self, name: str) -> typing.Any:
+        return self._options['option'][name]
 
     def _find_rplugins(self, source: str) -> typing.List[Path]:
         """Search for base.py or *.py
@@ -271,14 +387,47 @@ class Deoplete(logger.LoggingMixin):
             if self._max_parents > 0:
                 self._parent_count %= self._max_parents
 
+            if self._spare:
+                self._spare.preload_source(str(path))
+
         self._set_source_attributes(context)
 
+    def _balance_sources(self, context: UserContext) -> None:
+        """Move the sources between the processes by the gathering time.
+
+        The slowest process decides the completion time.
+        """
+        stats = [parent.get_stats() for parent in self._parents]
+        loads = [{name: x['time'] for name, x in stat.items()}
+                 for stat in stats]
+        fixed = {name for stat in stats for name, x in stat.items()
+                 if not x.get('is_movable', False)}
+        # Note: The small gain does not pay the cost of the move.
+        moves = balance_loads(loads, 0.005, fixed)
+        for name, src, dst in moves:
+            self.debug(  # type: ignore
+                f'Move Source: {name} (process {src} -> {dst})')
+            source_stats = stats[src][name]
+            self._parents[src].remove_source(name)
+            self._parents[dst].add_source(source_stats['path'])
+            stats[dst][name] = source_stats
+        if moves:
+            self._set_source_attributes(context)
+
+        self._vim.vars['deoplete#_placement'] = {
+            name: {'process': i, 'time': x['time'], 'cpu': x['cpu']}
+            for i, stat in enumerate(stats) for name, x in stat.items()
+        }
+
     def _load_filters(self, context: UserContext) -> None:
         for path in self._find_rplugins('filter'):
-            for parent in self._parents:
+            for parent in self._get_parents():
                 parent.add_filter(str(path))
 
+        self._start_spare()
+
     def _set_source_attributes(self, context: UserContext) -> None:
+        self._results_cache.clear()
         for parent in self._parents:
             parent.set_source_attributes(context)
 
@@ -291,6 +440,6 @@ class Deoplete(logger.LoggingMixin):
 
             if context['rpc'] != 'deoplete_on_event':
                 self.on_event(context)
-        elif context['custom'] != self._custom:
+        elif context['custom_version'] != self._custom_version:
             self._set_source_attributes(context)
-            self._custom = context['custom']
+            self._custom_version = context['custom_version']
@@ -69,10 +69,7 @@ class Filter(Base):
         if not context['candidates'] or not preferred_order_attrs:
             return list(context['candidates'])
 
-        max_list_size = self.vim.call(
-            'deoplete#custom#_get_option', 'max_list'
-        )
-
         return self.filter_attrs(
-            context['candidates'], preferred_order_attrs, max_list_size
+            context['candidates'], preferred_order_attrs,
+            context.get('max_list', 500)
         )
@@ -5,10 +5,9 @@
 # ============================================================================
 
 from pynvim import Nvim
-import re
 
 from deoplete.base.filter import Base
-from deoplete.util import fuzzy_escape, UserContext, Candidates
+from deoplete.util import FuzzyMatcher, UserContext, Candidates
 
 
 class Filter(Base):
@@ -18,15 +17,14 @@ class Filter(Base):
 
         self.name = 'matcher_full_fuzzy'
         self.description = 'full fuzzy matcher'
+        self.is_monotonic = True
+
+        self._matcher = FuzzyMatcher()
 
     def filter(self, context: UserContext) -> Candidates:
         complete_str = context['complete_str']
         if context['ignorecase']:
             complete_str = complete_str.lower()
-        p = re.compile(fuzzy_escape(complete_str, context['camelcase']))
-        if context['ignorecase']:
-            return [x for x in context['candidates']
-                    if p.search(x['word'].lower())]
-        else:
-            return [x for x in context['candidates']
-                    if p.search(x['word'])]
+        return self._matcher.filter(
+            context['candidates'], complete_str, context['ignorecase'],
+            context['camelcase'], False)
@@ -5,11 +5,10 @@
 # ============================================================================
 
 from pynvim import Nvim
-import re
 
 from deoplete.base.filter import Base
 from deoplete.util import binary_search_begin, binary_search_end
-from deoplete.util import fuzzy_escape, UserContext, Candidates
+from deoplete.util import FuzzyMatcher, UserContext, Candidates
 
 
 class Filter(Base):
@@ -19,6 +18,9 @@ class Filter(Base):
 
         self.name = 'matcher_fuzzy'
         self.description = 'fuzzy matcher'
+        self.is_monotonic = True
+
+        self._matcher = FuzzyMatcher()
 
     def filter(self, context: UserContext) -> Candidates:
         complete_str = context['complete_str']
@@ -38,8 +40,6 @@ class Filter(Base):
         else:
             candidates = context['candidates']
 
-        p = re.compile(fuzzy_escape(complete_str, context['camelcase']))
-        if context['ignorecase']:
-            return [x for x in candidates if p.match(x['word'].lower())]
-        else:
-            return [x for x in candidates if p.match(x['word'])]
+        return self._matcher.filter(
+            candidates, complete_str, context['ignorecase'],
+            context['camelcase'], True)
@@ -0,0 +1,50 @@
+# ============================================================================
+# FILE: matcher_fuzzy_score.py
+# AUTHOR: Shougo Matsushita <Shougo.Matsu at gmail.com>
+# License: MIT license
+# ============================================================================
+
+from pynvim import Nvim
+import heapq
+import typing
+
+from deoplete.base.filter import Base
+from deoplete.util import FuzzyMatcher, fuzzy_score
+from deoplete.util import UserContext, Candidates, Candidate
+
+
+class Filter(Base):
+
+    def __init__(self, vim: Nvim) -> None:
+        super().__init__(vim)
+
+        self.name = 'matcher_fuzzy_score'
+        self.description = 'scored fuzzy matcher'
+        self.is_monotonic = True
+
+        self._matcher = FuzzyMatcher()
+
+    def filter(self, context: UserContext) -> Candidates:
+        complete_str = context['complete_str']
+        if not complete_str:
+            return list(context['candidates'])
+
+        if context['ignorecase']:
+            complete_str = complete_str.lower()
+        candidates = self._matcher.filter(
+            context['candidates'], complete_str, context['ignorecase'],
+            context['camelcase'], False)
+
+        pattern = complete_str.lower()
+
+        # Note: The same scores are sorted by the word.  The order must not
+        # depend on the order of the input.  The previous results are
+        # narrowed by the child.
+        def key(x: Candidate) -> typing.Tuple[int, str]:
+            return (-fuzzy_score(x['word'], pattern), x['word'])
+
+        # Note: Only the top max_candidates are selected by the heap.
+        max_candidates = context.get('max_candidates', 0)
+        if 0 < max_candidates < len(candidates):
+            return heapq.nsmallest(max_candidates, candidates, key=key)
+        return sorted(candidates, key=key)
@@ -18,6 +18,7 @@ class Filter(Base):
 
         self.name = 'matcher_head'
         self.description = 'head matcher'
+        self.is_monotonic = True
 
     def filter(self, context: UserContext) -> Candidates:
         complete_str = context['complete_str']
@@ -39,8 +40,8 @@ class Filter(Base):
             candidates = context['candidates']
 
         if context['ignorecase']:
-            return [x for x in context['candidates']
+            return [x for x in candidates
                     if x['word'].lower().startswith(complete_str)]
         else:
-            return [x for x in context['candidates']
+            return [x for x in candidates
                     if x['word'].startswith(complete_str)]
@@ -17,6 +17,7 @@ class Filter(Base):
 
         self.name = 'matcher_length'
         self.description = 'length matcher'
+        self.is_monotonic = True
 
     def filter(self, context: UserContext) -> Candidates:
         input_len = len(context['complete_str'])
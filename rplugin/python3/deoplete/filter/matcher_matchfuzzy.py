@@ -23,6 +23,6 @@ class Filter(Base):
             return []
 
         return list(self.vim.call(
-                        'matchfuzzy', context['candidates'],
+                        'matchfuzzy', list(context['candidates']),
                         context['complete_str'], {'key': 'word'}
                 ))
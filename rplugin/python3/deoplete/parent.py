@@ -9,25 +9,37 @@ from functools import partial
 from pathlib import Path
 from pynvim import Nvim
 from queue import Queue
+import asyncio
+import itertools
+import mmap
 import msgpack
+import shutil
 import subprocess
 import sys
-import time
 import typing
 
 from deoplete import logger
 from deoplete.process import Process
-from deoplete.util import error_tb, error
+from deoplete.util import error_tb, error, unpack_candidates
 
 UserContext = typing.Dict[str, typing.Any]
 
 
 class _Parent(logger.LoggingMixin):
-    def __init__(self, vim: Nvim) -> None:
+    def __init__(self, vim: Nvim,
+                 on_results: typing.Optional[
+                     typing.Callable[[], None]] = None,
+                 on_exit: typing.Optional[
+                     typing.Callable[[typing.Any], None]] = None) -> None:
         self.name = 'parent'
 
         self._vim = vim
+        self._on_results = on_results
+        self._on_exit = on_exit
         self._loaded_filters: typing.Set[str] = set()
+        self._source_paths: typing.Set[str] = set()
+        self._options: UserContext = {'option': {}, 'buffer_option': {}}
+        self._stats: typing.Dict[str, typing.Dict[str, typing.Any]] = {}
 
         self._start_process()
 
@@ -36,8 +48,23 @@ class _Parent(logger.LoggingMixin):
         self.is_debug_enabled = True
 
     def add_source(self, path: str) -> None:
+        # Note: The path must be same with the child's source path.
+        path = str(Path(path).resolve())
+        self._source_paths.add(path)
         self._put('add_source', [path])
 
+    def preload_source(self, path: str) -> None:
+        """Import the source without loading it."""
+        self._put('preload_source', [path])
+
+    def remove_source(self, name: str) -> None:
+        if name in self._stats:
+            self._source_paths.discard(self._stats.pop(name)['path'])
+        self._put('remove_source', [name])
+
+    def get_source_paths(self) -> typing.Set[str]:
+        return self._source_paths
+
     def add_filter(self, path: str) -> None:
         if path in self._loaded_filters:
             return
@@ -51,16 +78,24 @@ class _Parent(logger.LoggingMixin):
     def set_custom(self, custom: typing.Any) -> None:
         self._put('set_custom', [custom])
 
+    def set_options(self, options: UserContext) -> None:
+        self._options = options
+        self._put('set_options', [options])
+
     def on_event(self, context: UserContext) -> None:
         self._put('on_event', [context])
 
+    def get_stats(self) -> typing.Dict[str, typing.Dict[str, typing.Any]]:
+        """Get the gathering costs of the sources in the process."""
+        return self._stats
+
     @abstractmethod
     def _start_process(self) -> None:
         pass
 
     @abstractmethod
     def _put(self, name: str,
-             args: typing.List[typing.Any]) -> typing.Optional[str]:
+             args: typing.List[typing.Any]) -> typing.Optional[int]:
         pass
 
 
@@ -72,12 +107,13 @@ class SyncParent(_Parent):
     def merge_results(self,
                       context: UserContext) -> typing.Tuple[typing.Any]:
         results = self._child._merge_results(context, queue_id=None)
+        self._stats = results['stats']
         ret = (results['is_async'], results['is_async'],
                results['merged_results']) if results else (False, [])
         return ret  # type: ignore
 
     def _put(self, name: str,
-             args: typing.List[typing.Any]) -> typing.Optional[str]:
+             args: typing.List[typing.Any]) -> typing.Optional[int]:
         self._child.main(name, args, queue_id=None)
         return None
 
@@ -113,10 +149,14 @@ class AsyncParent(_Parent):
 
     def _start_process(self) -> None:
         self._stdin: typing.Optional[typing.Any] = None
-        self._queue_id = ''
+        self._is_exited = False
+        self._queue_id = 0
+        self._queue_ids = itertools.count(1)
         self._queue_in: 'Queue[bytes]' = Queue()
-        self._queue_out: 'Queue[typing.Any]' = Queue()
         self._queue_err: 'Queue[typing.Any]' = Queue()
+        self._futures: typing.Dict[int, 'asyncio.Future[typing.Any]'] = {}
+        self._shared_dirs: typing.Set[str] = set()
+        self._sent_context: UserContext = {}
         if msgpack.version < (1, 0, 0):
             self._packer = msgpack.Packer(
                 encoding='utf-8',
@@ -124,11 +164,16 @@ class AsyncParent(_Parent):
             self._unpacker = msgpack.Unpacker(
                 encoding='utf-8',
                 unicode_errors='surrogateescape')
+            self._unpackb = partial(msgpack.unpackb,
+                                    encoding='utf-8',
+                                    unicode_errors='surrogateescape')
         else:
             self._packer = msgpack.Packer(
                 unicode_errors='surrogateescape')
             self._unpacker = msgpack.Unpacker(
                 unicode_errors='surrogateescape')
+            self._unpackb = partial(msgpack.unpackb,
+                                    unicode_errors='surrogateescape')
         self._prev_pos: typing.List[typing.Any] = []
 
         info = None
@@ -154,6 +199,76 @@ class AsyncParent(_Parent):
         self._stdin = stdin
         return self._unpacker
 
+    def _set_result(self, child_out: typing.Any) -> None:
+        # Note: It is called in the event loop when the child answers.
+        try:
+            future = self._futures.get(child_out['queue_id'], None)
+        except TypeError:
+            self._queue_err.put(
+                '"stdout" seems contaminated by sources. '
+                '"stdout" is used for RPC; Please pipe or discard')
+            return
+        if future and not future.done():
+            future.set_result(child_out)
+        else:
+            # The results are not used
+            self._release_shared(child_out)
+
+    def _read_shared(self, packed: typing.Dict[str, typing.Any]
+                     ) -> typing.Dict[str, typing.Any]:
+        # Note: The file is mapped and unpacked without copying the data.
+        path = Path(packed['shared'])
+        self._shared_dirs.add(str(path.parent))
+        try:
+            with path.open('rb') as f, mmap.mmap(
+                    f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                return typing.cast(typing.Dict[str, typing.Any],
+                                   self._unpackb(m))
+        finally:
+            path.unlink()
+
+    def _release_shared(self, child_out: typing.Any) -> None:
+        for result in child_out.get('merged_results', []):
+            candidates = result['candidates']
+            if isinstance(candidates, dict) and 'shared' in candidates:
+                path = Path(candidates['shared'])
+                self._shared_dirs.add(str(path.parent))
+                if path.exists():
+                    path.unlink()
+
+    def _exited(self) -> None:
+        # Note: It is called in the event loop when the child is exited.
+        if self._is_exited:
+            return
+        self._is_exited = True
+        self._hnd = None
+
+        for future in self._futures.values():
+            future.cancel()
+        self._futures = {}
+
+        for shared_dir in self._shared_dirs:
+            shutil.rmtree(shared_dir, ignore_errors=True)
+
+        self._vim.async_call(self._report_exit)
+
+    def _report_exit(self) -> None:
+        # Note: _get() is not called after the exit.  The errors from the
+        # child are reported here.
+        self._print_errors()
+        if self._on_exit:
+            self._on_exit(self)
+        else:
+            self._print_error('The child process is exited!')
+
+    def _on_done(self, queue_id: int,
+                 future: 'asyncio.Future[typing.Any]') -> None:
+        if (future.cancelled() or queue_id != self._queue_id
+                or not self._on_results):
+            return
+        # Publish the results without waiting for the next request
+        self._vim.async_call(self._on_results)
+
     def merge_results(self,
                       context: UserContext) -> typing.Tuple[typing.Any, ...]:
         # Note: TextChangedP is triggered when Update
@@ -167,23 +282,42 @@ class AsyncParent(_Parent):
             if not queue_id:
                 return (False, False, [])
 
+            # Note: The previous requests are superseded.
+            for future in self._futures.values():
+                if future.done() and not future.cancelled():
+                    self._release_shared(future.result())
+                future.cancel()
+            future = self._vim.loop.create_future()
+            future.add_done_callback(partial(self._on_done, queue_id))
+            self._futures = {queue_id: future}
+
         get = self._get(queue_id)
         if not get:
             # Skip the next merge_results
             self._queue_id = queue_id
             self._prev_pos = context['position']
             return (True, False, [])
-        self._queue_id = ''
+        self._queue_id = 0
         results = get[0]
+        if results:
+            self._stats = results.get('stats', self._stats)
+            for result in results['merged_results']:
+                candidates = result['candidates']
+                if isinstance(candidates, dict) and 'shared' in candidates:
+                    candidates = self._read_shared(candidates)
+                result['candidates'] = unpack_candidates(candidates)
         return (results['is_async'], results['is_async'],
                 results['merged_results']) if results else (False, [])
 
     def _put(self, name: str,
-             args: typing.List[typing.Any]) -> typing.Optional[str]:
+             args: typing.List[typing.Any]) -> typing.Optional[int]:
         if not self._hnd:
             return None
 
-        queue_id = str(time.time())
+        if name in ('merge_results', 'on_event', 'set_source_attributes'):
+            args = [self._encode_context(args[0])]
+
+        queue_id = next(self._queue_ids)
         msg = self._packer.pack({
             'name': name, 'args': args, 'queue_id': queue_id
         })
@@ -195,27 +329,45 @@ class AsyncParent(_Parent):
                     self._stdin.write(self._queue_in.get_nowait())
             except BrokenPipeError:
                 error_tb(self._vim, 'Crash in child process')
-                error(self._vim, 'stderr=' +
-                      str(self._proc.read_error()))  # type: ignore
-                self._hnd = None
+                self._exited()
+                return None
         return queue_id
 
-    def _get(self, queue_id: str) -> typing.List[typing.Any]:
-        if not self._hnd:
-            return []
+    def _encode_context(self, context: UserContext) -> UserContext:
+        """Encode the context by the difference from the previous one.
 
-        check_stderr = self._vim.call(
-            'deoplete#custom#_get_option', 'check_stderr')
+        The child rebuilds the context from the previous one.  "custom" is
+        sent only if "custom_version" is changed.
+        """
+        prev = self._sent_context
+        self._sent_context = dict(context)
+        changed = {
+            key: value for key, value in context.items()
+            if key not in prev or (
+                prev[key] is not value and key != 'custom' and
+                prev[key] != value)
+        }
+        if prev.get('custom_version', -1) != context.get(
+                'custom_version', -1):
+            changed['custom'] = context['custom']
+        return {
+            'delta': changed,
+            'removed': [x for x in prev if x not in context],
+        }
+
+    def _print_errors(self) -> None:
+        check_stderr = self._options['option'].get('check_stderr', True)
         while check_stderr and not self._queue_err.empty():
             self._print_error(self._queue_err.get_nowait())
 
-        outs = []
-        while not self._queue_out.empty():
-            outs.append(self._queue_out.get_nowait())
-        try:
-            return [x for x in outs if x['queue_id'] == queue_id]
-        except TypeError:
-            error_tb(self._vim,
-                     '"stdout" seems contaminated by sources. '
-                     '"stdout" is used for RPC; Please pipe or discard')
+    def _get(self, queue_id: int) -> typing.List[typing.Any]:
+        if not self._hnd:
+            return []
+
+        self._print_errors()
+
+        future = self._futures.get(queue_id, None)
+        if not future or not future.done():
             return []
+        self._futures.pop(queue_id)
+        return [future.result()]
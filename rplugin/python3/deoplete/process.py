@@ -27,7 +27,7 @@ class Process(asyncio.SubprocessProtocol):
         unpacker = self._unpacker
         unpacker.feed(data)
         for child_out in unpacker:
-            self._plugin._queue_out.put(child_out)
+            self._plugin._set_result(child_out)
 
     def process_exited(self) -> None:
-        self._plugin._queue_err.put('The child process is exited!')
+        self._plugin._exited()
@@ -4,12 +4,28 @@
 # License: MIT license
 # ============================================================================
 
+from bisect import bisect_left, insort
+from collections import Counter
+from concurrent import futures
+from itertools import chain
+from pathlib import Path
 from pynvim import Nvim
+import hashlib
+import mmap
+import msgpack
+import os
+import queue
+import re
+import threading
+import time
 import typing
 
 from deoplete.base.source import Base
-from deoplete.util import parse_buffer_pattern, getlines
-from deoplete.util import UserContext, Candidates
+from deoplete.util import ColumnCandidates, UserContext, Candidates
+
+LineRange = typing.Tuple[int, int]
+
+CACHE_FORMAT = 1
 
 
 class Source(Base):
@@ -21,51 +37,551 @@ class Source(Base):
         self.mark = '[B]'
         self.events = ['Init', 'BufReadPost', 'BufWritePost', 'InsertLeave']
         self.vars = {
+            'cache_directory': str(Path(os.environ.get(
+                'XDG_STATE_HOME', Path.home().joinpath('.local', 'state'))
+                ).joinpath('deoplete', 'buffer')),
+            'cache_size': 50000000,
             'require_same_filetype': True,
         }
 
         self._limit = 1000000
         self._buffers: typing.Dict[int, typing.Any] = {}
         self._max_lines = 5000
+        self._max_width = 1000
+        self._min_cache_lines = 1000
+        self._chunk_lines = 250
+        self._max_load_time = 0.01
+        self._max_words = 200000
+        self._executor: typing.Optional[futures.ThreadPoolExecutor] = None
+
+        # Note: The words index is shared by the buffers.  The mask of the
+        # word is the bits of the buffers which have the word.
+        self._masks: typing.Dict[str, int] = {}
+        self._keys: typing.List[typing.Tuple[str, str]] = []
+        self._new_keys: typing.List[typing.Tuple[str, str]] = []
+        self._views: typing.Dict[int, ColumnCandidates] = {}
+        self._pending: typing.Dict[int, typing.Dict[str, typing.Any]] = {}
 
     def on_event(self, context: UserContext) -> None:
-        self._make_cache(context)
+        bufnr = context['bufnr']
+        if (context['event'] == 'BufReadPost' or
+                bufnr not in self._buffers or
+                not self._update_cache(self._buffers[bufnr], context)):
+            self._register_buffer(context)
+        elif context['event'] == 'BufWritePost':
+            # Note: The buffer is same with the file after the write.
+            self._save_cache(self._buffers[bufnr], context['bufpath'])
 
-        tab_bufnrs = self.vim.call('tabpagebuflist')
-        self._buffers = {
-            x['bufnr']: x for x in self._buffers.values()
-            if x['bufnr'] in tab_bufnrs or
-            self.vim.call('buflisted', x['bufnr'])
+        bufnrs = set(self.vim.call('tabpagebuflist'))
+        bufnrs.update(self.vim.eval(
+            "filter(range(1, bufnr('$')), 'buflisted(v:val)')"))
+        for buf in list(self._buffers.values()):
+            if buf['bufnr'] not in bufnrs:
+                self._remove_buffer(buf)
+        self._pending = {
+            x: y for x, y in self._pending.items() if x in bufnrs
         }
 
     def gather_candidates(self, context: UserContext) -> Candidates:
+        deadline = time.monotonic() + self._max_load_time
+        for buf in self._buffers.values():
+            if buf['loader']:
+                self._update_loader(buf, deadline)
+
         tab_bufnrs = self.vim.call('tabpagebuflist')
         same_filetype = self.get_var('require_same_filetype')
+
+        def is_target(x: typing.Dict[str, typing.Any]) -> bool:
+            return bool(not same_filetype or
+                        x['filetype'] in context['filetypes'] or
+                        x['filetype'] in context['same_filetypes'] or
+                        x['bufnr'] in tab_bufnrs)
+
+        # Note: The pending buffers are parsed when they are needed.  The
+        # files are parsed in the background and the others one by one.
+        if context['bufnr'] in self._pending:
+            self._make_cache(self._pending.pop(context['bufnr']), True)
+        is_parsed = False
+        for pending in [x for x in self._pending.values() if is_target(x)]:
+            if is_parsed and not pending['bufpath']:
+                continue
+            del self._pending[pending['bufnr']]
+            if not self._make_cache(pending, False):
+                is_parsed = True
+
+        # Note: The changes in insert mode are applied incrementally.
+        if context['bufnr'] in self._buffers:
+            self._update_cache(self._buffers[context['bufnr']], context)
+
+        mask = 0
+        for x in self._buffers.values():
+            if is_target(x):
+                mask |= x['bit']
         return {'sorted_candidates': [  # type: ignore
-            x['candidates'] for x in self._buffers.values()
-            if not same_filetype or
-            x['filetype'] in context['filetypes'] or
-            x['filetype'] in context['same_filetypes'] or
-            x['bufnr'] in tab_bufnrs
+            self._get_candidates(mask)
         ]}
 
-    def _make_cache(self, context: UserContext) -> None:
-        # Bufsize check
-        size = self.vim.call('line2byte',
-                             self.vim.call('line', '$') + 1) - 1
-        if size > self._limit:
-            return
+    def _register_buffer(self, context: UserContext) -> None:
+        bufnr = context['bufnr']
+        if bufnr in self._buffers:
+            self._remove_buffer(self._buffers[bufnr])
+        self._pending[bufnr] = {
+            'bufnr': bufnr,
+            'filetype': self.get_buf_option('filetype'),
+            'keyword_pattern': context['keyword_pattern'],
+            'bufpath': context['bufpath'],
+        }
+
+    def _make_cache(self, pending: typing.Dict[str, typing.Any],
+                    is_current: bool) -> bool:
+        """Parse the buffer.
 
+        It returns True if the buffer is parsed in the background.
+        """
+        bufnr = pending['bufnr']
+        path = (pending['bufpath'] if not self.vim.call(
+            'getbufvar', bufnr, '&modified') else '')
+        num_lines: typing.Optional[int] = None
+        if is_current:
+            num_lines = self.vim.call('line', '$')
+            size = self.vim.call('line2byte', num_lines + 1) - 1
+        else:
+            try:
+                size = os.path.getsize(path) if path else 0
+            except OSError:
+                path = ''
+            if not path:
+                # Note: The size of the hidden buffer is unknown in Vim.
+                size = self.vim.call('deoplete#util#_get_buffer_size', bufnr)
+        if size > self._limit and not path:
+            # Note: The large buffers are loaded only from the files.
+            return False
+
+        used = 0
+        for x in self._buffers.values():
+            used |= x['bit']
         try:
-            self._buffers[context['bufnr']] = {
-                'bufnr': context['bufnr'],
-                'filetype': self.get_buf_option('filetype'),
-                'candidates': [
-                    {'word': x} for x in
-                    sorted(parse_buffer_pattern(getlines(self.vim),
-                                                context['keyword_pattern']),
-                           key=str.lower)
-                ]
+            # Note: The changes are recorded after the attach.
+            attached = self.vim.call('deoplete#util#_attach_buffer', bufnr)
+            buf = {
+                'bufnr': bufnr,
+                'filetype': pending['filetype'],
+                'keyword_pattern': pending['keyword_pattern'],
+                'is_attached': attached,
+                'lines': [],
+                'words': Counter(),
+                # The lowest unused bit
+                'bit': ~used & (used + 1),
+                'loader': None,
+                # Note: The large files are saved to the disk cache only
+                # by the loader.
+                'is_large': size > self._limit,
+                'is_truncated': False,
             }
+            self._buffers[bufnr] = buf
+
+            if path and (size > self._limit or not is_current):
+                self._start_loader(buf, path, num_lines)
+                return True
+
+            # Note: The unchanged files are loaded from the disk cache.
+            cache = self._load_cache(path, buf['keyword_pattern'])
+            if cache is not None:
+                self._set_words(buf, 0, cache)
+                return False
+            lines = self._get_lines(bufnr, 1, num_lines, self._limit)
+            if sum(len(x) + 1 for x in lines) > self._limit:
+                self._remove_buffer(buf)
+                return False
+            self._set_lines(buf, 0, lines)
+            self._save_cache(buf, path)
         except UnicodeDecodeError:
+            if bufnr in self._buffers:
+                self._remove_buffer(self._buffers[bufnr])
+        return False
+
+    def _remove_buffer(self, buf: typing.Dict[str, typing.Any]) -> None:
+        if buf['loader']:
+            buf['loader']['cancel'].set()
+        for word in buf['words']:
+            self._remove_word(word, buf['bit'])
+        self._buffers.pop(buf['bufnr'], None)
+
+    def _update_cache(self, buf: typing.Dict[str, typing.Any],
+                      context: UserContext) -> bool:
+        """Apply the changed lines of the buffer.
+
+        It returns False if the buffer must be parsed again.
+        """
+        if buf['keyword_pattern'] != context['keyword_pattern']:
+            return False
+        if buf['loader'] and not self._update_loader(
+                buf, time.monotonic() + self._max_load_time):
+            # Note: The changes are applied after the loading.
+            return True
+        if not buf['is_attached']:
+            return False
+
+        changes = self.vim.call('deoplete#util#_get_buffer_changes',
+                                buf['bufnr'])
+        if changes == -1:
+            return False
+        if not changes:
+            return True
+
+        lines = buf['lines']
+        dirty: typing.List[LineRange] = []
+        for first, last, new_last in changes:
+            for words in lines[first:last]:
+                self._remove_words(buf, words)
+            lines[first:last] = [[] for _ in range(new_last - first)]
+            dirty = self._merge_range(dirty, first, last, new_last)
+
+        try:
+            for start, end in dirty:
+                self._set_lines(buf, start,
+                                self._get_lines(buf['bufnr'], start + 1, end))
+        except UnicodeDecodeError:
+            buf['is_attached'] = False
+            return False
+        return True
+
+    def _merge_range(self, dirty: typing.List[LineRange], first: int,
+                     last: int, new_last: int) -> typing.List[LineRange]:
+        # Note: The dirty ranges are moved by the change.
+        delta = new_last - last
+        merged: typing.List[LineRange] = []
+        start = first
+        end = new_last
+        for s, e in dirty:
+            if e < first:
+                merged.append((s, e))
+            elif s > last:
+                merged.append((s + delta, e + delta))
+            else:
+                start = min(start, s)
+                end = max(end, e + delta)
+        merged.append((start, end))
+        return merged
+
+    def _get_lines(self, bufnr: int, start: int, end: typing.Optional[int],
+                   max_size: int = 0) -> typing.List[str]:
+        """Get the lines of the buffer by chunks.
+
+        If end is None, the lines are got until the end of the buffer.  If
+        the lines are larger than max_size, the rest lines are not got.
+        """
+        lines: typing.List[str] = []
+        size = 0
+        current = start
+        while end is None or current <= end:
+            last = current + self._max_lines - 1
+            chunk = self.vim.call('getbufline', bufnr, current,
+                                  last if end is None else min(end, last))
+            lines += chunk
+            if end is None and len(chunk) < self._max_lines:
+                break
+            size += sum(len(x) + 1 for x in chunk)
+            if max_size and size > max_size:
+                break
+            current += self._max_lines
+        return lines
+
+    def _start_loader(self, buf: typing.Dict[str, typing.Any], path: str,
+                      num_lines: typing.Optional[int]) -> None:
+        if not self._executor:
+            self._executor = futures.ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix='deoplete-buffer')
+        loader: typing.Dict[str, typing.Any] = {
+            'queue': queue.Queue(),
+            'cancel': threading.Event(),
+            'num_lines': num_lines,
+        }
+        # Note: The disk cache is read and written in the worker.
+        pattern = buf['keyword_pattern']
+        max_size = self.get_var('cache_size')
+        cache: typing.Optional[typing.Dict[str, typing.Any]] = None
+        if max_size and not re.compile(pattern).groups:
+            try:
+                cache = {
+                    'path': self._get_cache_path(path),
+                    'header': self._get_cache_header(path, pattern),
+                    'max_size': max_size,
+                }
+            except OSError:
+                pass
+        loader['future'] = self._executor.submit(
+            self._load_file, path, pattern, num_lines,
+            loader['queue'], loader['cancel'], cache)
+        buf['loader'] = loader
+
+    def _load_file(self, path: str, pattern: str,
+                   num_lines: typing.Optional[int],
+                   chunks: 'queue.Queue[typing.List[typing.List[str]]]',
+                   cancel: threading.Event,
+                   cache: typing.Optional[typing.Dict[str, typing.Any]]
+                   ) -> bool:
+        """Parse the file in the worker thread.
+
+        The words of the lines are put into the queue by chunks.  The
+        loading stops if the file has too many words.  The words are read
+        from the disk cache if it is valid.  The whole parsed file is
+        saved to the disk cache.  It returns False if the loading stops.
+        """
+        cached = (self._read_cache(cache['path'], path, pattern)
+                  if cache else None)
+        if cached is not None:
+            for i in range(0, len(cached), self._chunk_lines):
+                chunks.put(cached[i:i + self._chunk_lines])
+            return True
+
+        compiled = re.compile(pattern)
+        seen: typing.Set[str] = set()
+        lines: typing.List[typing.List[str]] = []
+        chunk: typing.List[typing.List[str]] = []
+        is_finished = True
+        with open(path, 'rb') as f:
+            for i, line in enumerate(f):
+                if (num_lines is not None and i >= num_lines or
+                        cancel.is_set()):
+                    is_finished = False
+                    break
+                words = self._get_words(compiled, line.decode(
+                    'utf-8', 'replace').rstrip('\r\n'))
+                seen.update(words)
+                if len(seen) > self._max_words:
+                    is_finished = False
+                    break
+                chunk.append(words)
+                if len(chunk) >= self._chunk_lines:
+                    chunks.put(chunk)
+                    lines += chunk
+                    chunk = []
+        if chunk:
+            chunks.put(chunk)
+            lines += chunk
+
+        # Note: The file may be changed while the parsing.
+        if (cache and is_finished and len(lines) >= self._min_cache_lines and
+                self._is_cache_valid(path, pattern, cache['header'])):
+            self._write_cache(cache['path'], cache['header'], lines,
+                              cache['max_size'])
+        return is_finished
+
+    def _update_loader(self, buf: typing.Dict[str, typing.Any],
+                       deadline: float) -> bool:
+        """Apply the loaded chunks of the buffer.
+
+        It returns True if the loading is finished.
+        """
+        loader = buf['loader']
+        # Note: The future must be checked before the queue is empty.
+        done = loader['future'].done()
+        while True:
+            try:
+                chunk = loader['queue'].get_nowait()
+            except queue.Empty:
+                break
+            self._set_words(buf, len(buf['lines']), chunk)
+            if time.monotonic() > deadline:
+                return False
+        if not done:
+            return False
+
+        buf['loader'] = None
+        if loader['future'].exception():
+            self.print_error(f'Error when loading the buffer '
+                             f'{buf["bufnr"]}: {loader["future"].exception()}')
+            buf['is_truncated'] = True
+        elif not loader['future'].result():
+            buf['is_truncated'] = True
+        # Note: The rest lines are not parsed.
+        if loader['num_lines'] is not None:
+            buf['lines'] += [[] for _ in range(
+                loader['num_lines'] - len(buf['lines']))]
+        return True
+
+    def _get_words(self, pattern: typing.Pattern[str],
+                   line: str) -> typing.List[str]:
+        if len(line) < self._max_width:
+            return typing.cast(typing.List[str], pattern.findall(line))
+        # Note: Only the head of very long lines is parsed.  The last word
+        # may be cut.
+        return typing.cast(typing.List[str], pattern.findall(
+            line, 0, self._max_width)[:-1])
+
+    def _set_lines(self, buf: typing.Dict[str, typing.Any], start: int,
+                   lines: typing.List[str]) -> None:
+        pattern = re.compile(buf['keyword_pattern'])
+        self._set_words(buf, start, [
+            self._get_words(pattern, x) for x in lines])
+
+    def _set_words(self, buf: typing.Dict[str, typing.Any], start: int,
+                   lines: typing.List[typing.List[str]]) -> None:
+        # Note: The lines in the range are empty.
+        buf['lines'][start:start + len(lines)] = lines
+
+        counts = buf['words']
+        masks = self._masks
+        bit = buf['bit']
+        new_keys = self._new_keys
+        added = list(chain.from_iterable(lines))
+        for word in set(added).difference(counts):
+            mask = masks.get(word, 0)
+            if not mask:
+                new_keys.append((word.lower(), word))
+            masks[word] = mask | bit
+            self._views = {}
+        counts.update(added)
+
+    def _merge_keys(self) -> None:
+        # Note: The new keys are sorted only when they are needed.
+        keys = self._keys
+        if len(self._new_keys) > 100:
+            # Note: The sorted runs are merged by sort().
+            keys += sorted(self._new_keys)
+            keys.sort()
+        else:
+            for key in self._new_keys:
+                insort(keys, key)
+        self._new_keys = []
+
+    def _remove_words(self, buf: typing.Dict[str, typing.Any],
+                      words: typing.List[str]) -> None:
+        counts = buf['words']
+        for word in words:
+            counts[word] -= 1
+            if not counts[word]:
+                del counts[word]
+                self._remove_word(word, buf['bit'])
+
+    def _remove_word(self, word: str, bit: int) -> None:
+        mask = self._masks[word] & ~bit
+        if mask:
+            self._masks[word] = mask
+        else:
+            del self._masks[word]
+            if self._new_keys:
+                self._merge_keys()
+            del self._keys[bisect_left(self._keys, (word.lower(), word))]
+        self._views = {}
+
+    def _get_candidates(self, mask: int) -> ColumnCandidates:
+        """Get the words of the buffers in the mask.
+
+        The words are sorted by the lowercase words.
+        """
+        if mask not in self._views:
+            if self._new_keys:
+                self._merge_keys()
+            used = 0
+            for x in self._buffers.values():
+                used |= x['bit']
+            if not ~mask & used:
+                words = [x[1] for x in self._keys]
+            else:
+                masks = self._masks
+                words = [x[1] for x in self._keys if masks[x[1]] & mask]
+            self._views[mask] = ColumnCandidates(words)
+        return self._views[mask]
+
+    def _get_cache_path(self, path: str) -> Path:
+        return Path(self.get_var('cache_directory')).joinpath(
+            hashlib.sha1(path.encode('utf-8', 'surrogateescape')
+                         ).hexdigest() + '.mpack')
+
+    def _get_cache_header(self, path: str,
+                          pattern: str) -> typing.List[typing.Any]:
+        stat = os.stat(path)
+        return [CACHE_FORMAT, path, stat.st_size, stat.st_mtime_ns, pattern]
+
+    def _is_cache_valid(self, path: str, pattern: str,
+                        header: typing.List[typing.Any]) -> bool:
+        try:
+            return header == self._get_cache_header(path, pattern)
+        except OSError:
+            return False
+
+    def _load_cache(self, path: str, pattern: str
+                    ) -> typing.Optional[typing.List[typing.List[str]]]:
+        """Load the words of the lines from the disk cache.
+
+        The cache is valid only for the same file size, mtime and keyword
+        pattern.
+        """
+        if not path or not self.get_var('cache_size'):
+            return None
+        return self._read_cache(self._get_cache_path(path), path, pattern)
+
+    def _read_cache(self, cache_path: Path, path: str, pattern: str
+                    ) -> typing.Optional[typing.List[typing.List[str]]]:
+        # Note: It is called in the worker thread too.  It must not use vim.
+        try:
+            with cache_path.open('rb') as f, mmap.mmap(
+                    f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                [header, words, lines] = msgpack.unpackb(
+                    m, raw=False, unicode_errors='surrogateescape')
+            if not self._is_cache_valid(path, pattern, header):
+                return None
+            # Note: The mtime is the last used time for the eviction.
+            os.utime(str(cache_path))
+            return [list(map(words.__getitem__, x)) for x in lines]
+        except (OSError, ValueError, TypeError, IndexError,
+                msgpack.UnpackException):
+            return None
+
+    def _save_cache(self, buf: typing.Dict[str, typing.Any],
+                    path: str) -> None:
+        max_size = self.get_var('cache_size')
+        if (not path or not max_size or buf['loader'] or
+                buf['is_large'] or buf['is_truncated'] or
+                len(buf['lines']) < self._min_cache_lines or
+                re.compile(buf['keyword_pattern']).groups):
             return
+
+        try:
+            header = self._get_cache_header(path, buf['keyword_pattern'])
+        except OSError:
+            return
+        self._write_cache(self._get_cache_path(path), header, buf['lines'],
+                          max_size)
+
+    def _write_cache(self, cache_path: Path, header: typing.List[typing.Any],
+                     lines: typing.List[typing.List[str]],
+                     max_size: int) -> None:
+        # Note: It is called in the worker thread too.  It must not use vim.
+        # The words are stored once and the lines are the indexes.
+        indexes: typing.Dict[str, int] = {}
+        indexed = [[indexes.setdefault(word, len(indexes)) for word in x]
+                   for x in lines]
+        temp_path = cache_path.with_suffix(
+            f'.{threading.get_ident()}.tmp')
+        try:
+            data = msgpack.packb(
+                [header, list(indexes), indexed],
+                use_bin_type=True, unicode_errors='surrogateescape')
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path.write_bytes(data)
+            os.replace(str(temp_path), str(cache_path))
+        except (OSError, ValueError):
+            return
+        self._evict_cache(cache_path.parent, max_size)
+
+    def _evict_cache(self, directory: Path, max_size: int) -> None:
+        # Note: The least recently used files are removed.
+        files = []
+        for x in directory.glob('*.mpack'):
+            try:
+                stat = x.stat()
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, x))
+        total = sum(x[1] for x in files)
+        for [_, size, cache_path] in sorted(files, key=lambda x: x[0]):
+            if total <= max_size:
+                break
+            try:
+                cache_path.unlink()
+            except OSError:
+                continue
+            total -= size
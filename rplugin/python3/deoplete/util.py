@@ -4,6 +4,7 @@
 # License: MIT license
 # ============================================================================
 
+from collections import OrderedDict
 from os.path import expandvars
 from pathlib import Path
 from pynvim import Nvim
@@ -11,6 +12,7 @@ from pynvim.api import Buffer
 import glob
 import importlib.util
 import re
+import string
 import sys
 import traceback
 import typing
@@ -20,6 +22,9 @@ UserContext = typing.Dict[str, typing.Any]
 Candidate = typing.Dict[str, typing.Any]
 Candidates = typing.List[Candidate]
 
+# The version of the packed candidates format
+CANDIDATES_FORMAT = 1
+
 
 def set_pattern(variable: typing.Dict[str, str],
                 keys: str, pattern: typing.Any) -> None:
@@ -44,6 +49,114 @@ def convert2candidates(li: typing.Any) -> Candidates:
     return ret
 
 
+class ColumnCandidates(typing.Sequence[Candidate]):
+    """Candidates stored as parallel lists of the candidate keys.
+
+    It uses much less memory than the list of dicts.  The candidate dicts
+    are made only when they are accessed.
+    """
+
+    __slots__ = ('_keys', '_columns', '_constants')
+
+    def __init__(self, word: typing.List[str],
+                 **columns: typing.List[typing.Any]) -> None:
+        self._keys: typing.Tuple[str, ...] = ('word',) + tuple(columns)
+        self._columns: typing.Tuple[typing.List[typing.Any], ...] = (
+            (word,) + tuple(columns.values()))
+        self._constants: typing.Dict[str, typing.Any] = {}
+
+    @classmethod
+    def from_packed(cls, packed: typing.Dict[str, typing.Any]
+                    ) -> 'ColumnCandidates':
+        """Make the candidates from the result of pack_candidates()."""
+        columns = dict(packed['columns'])
+        candidates = cls(columns.pop('word'), **columns)
+        candidates._constants = packed['constants']
+        return candidates
+
+    def __len__(self) -> int:
+        return len(self._columns[0])
+
+    @typing.overload
+    def __getitem__(self, index: int) -> Candidate:
+        ...
+
+    @typing.overload
+    def __getitem__(self, index: slice) -> Candidates:
+        ...
+
+    def __getitem__(self, index: typing.Union[int, slice]) -> typing.Any:
+        if isinstance(index, slice):
+            return self._make([x[index] for x in self._columns])
+        candidate = dict(zip(self._keys, [x[index] for x in self._columns]))
+        candidate.update(self._constants)
+        return candidate
+
+    def __iter__(self) -> typing.Iterator[Candidate]:
+        return iter(self._make(self._columns))
+
+    def __add__(self, other: typing.Iterable[Candidate]) -> Candidates:
+        return list(self) + list(other)
+
+    def __radd__(self, other: typing.Iterable[Candidate]) -> Candidates:
+        return list(other) + list(self)
+
+    def _make(self, columns: typing.Sequence[
+            typing.List[typing.Any]]) -> Candidates:
+        constants = self._constants
+        if constants:
+            return [dict(zip(self._keys, x), **constants)
+                    for x in zip(*columns)]
+        if len(columns) == 1:
+            return [{'word': x} for x in columns[0]]
+        return [dict(zip(self._keys, x)) for x in zip(*columns)]
+
+
+def pack_candidates(candidates: Candidates) -> typing.Any:
+    """Pack the candidates to the columnar format for the child process.
+
+    The keys are sent once and the values of a key are sent as an array.
+    The same values for all candidates are sent once as constants.  If the
+    candidates have different keys, they are not packed.
+    """
+    if not candidates:
+        return candidates
+    keys = candidates[0].keys()
+    if any(x.keys() != keys for x in candidates):
+        return candidates
+
+    columns: typing.Dict[str, typing.List[typing.Any]] = {}
+    constants: typing.Dict[str, typing.Any] = {}
+    for key in keys:
+        column = [x[key] for x in candidates]
+        first = column[0]
+        # Note: 1 == True in Python, but the types must be kept.
+        if key != 'word' and all(x == first and type(x) is type(first)
+                                 for x in column):
+            constants[key] = first
+        else:
+            columns[key] = column
+    return {
+        'format': CANDIDATES_FORMAT,
+        'columns': columns,
+        'constants': constants,
+    }
+
+
+def unpack_candidates(packed: typing.Any) -> typing.Sequence[Candidate]:
+    """Unpack the result of pack_candidates().
+
+    The candidates are decoded when they are accessed.
+    """
+    if not isinstance(packed, dict):
+        # Not packed
+        return typing.cast(Candidates, packed)
+    if packed.get('format', 0) != CANDIDATES_FORMAT:
+        raise ValueError('Unknown candidates format: %r' %
+                         packed.get('format', 0))
+    return ColumnCandidates.from_packed(packed)
+
+
 def globruntime(runtimepath: str, path: str) -> typing.List[str]:
     ret: typing.List[str] = []
     for rtp in runtimepath.split(','):
@@ -139,6 +252,23 @@ def get_custom(custom: typing.Dict[str, typing.Any],
         return default
 
 
+def get_filetype_option(options: typing.Dict[str, typing.Any],
+                        name: str, filetype: str,
+                        default: typing.Any) -> typing.Any:
+    # Same as deoplete#custom#_get_filetype_option() for options snapshot
+    buffer_option = options['buffer_option']
+    if name in buffer_option:
+        # Use buffer_option instead
+        return buffer_option[name]
+
+    option = options['option'][name]
+    # Check filetype -> a.b filetype -> '_'
+    for ft in [filetype] + filetype.split('.') + ['_']:
+        if ft in option:
+            return option[ft]
+    return default
+
+
 def get_syn_names(vim: Nvim) -> typing.List[str]:
     return list(vim.call('deoplete#util#get_syn_names'))
 
@@ -166,6 +296,213 @@ def fuzzy_escape(string: str, camelcase: bool) -> str:
     return p
 
 
+class FuzzyMatcher(object):
+    """The fuzzy matcher without regexp.
+
+    The pattern characters must appear in the word in order.  The character
+    after a non word character must follow it immediately.  The candidates
+    are narrowed by the substring tests first and the order is checked only
+    for the rest.  The lowercase words of the last candidates are cached.
+    """
+
+    def __init__(self) -> None:
+        self._candidates: Candidates = []
+        self._keys: typing.List[str] = []
+
+    def filter(self, candidates: Candidates, pattern: str,
+               ignorecase: bool, camelcase: bool,
+               head: bool) -> Candidates:
+        """Filter the candidates by the pattern.
+
+        If `head` is True, the pattern must match from the first character.
+        If `ignorecase` is True, the pattern must be lowercase.
+        """
+        if not pattern:
+            return list(candidates)
+
+        camel = (not ignorecase and camelcase and
+                 re.search(r'[A-Z]', pattern) is not None)
+        if ignorecase or camel:
+            keys = self._get_keys(candidates)
+            runs = _get_runs(pattern.lower())
+        else:
+            keys = [x['word'] for x in candidates]
+            runs = _get_runs(pattern)
+
+        first = runs[0]
+        if head:
+            pairs = [x for x in zip(candidates, keys)
+                     if x[1].startswith(first)]
+        else:
+            pairs = [x for x in zip(candidates, keys) if first in x[1]]
+        for run in set(runs[1:]):
+            pairs = [x for x in pairs if run in x[1]]
+
+        if camel:
+            uppers = [[(i, c) for i, c in enumerate(x) if 'A' <= c <= 'Z']
+                      for x in _get_runs(pattern)]
+            return [x for x, key in pairs
+                    if _match_camel(x['word'], key, runs, uppers, head)]
+        if len(runs) > 1:
+            pairs = [x for x in pairs if _match_runs(x[1], runs, head)]
+        return [x for x, _ in pairs]
+
+    def _get_keys(self, candidates: Candidates) -> typing.List[str]:
+        # Note: The same candidates are filtered while the input grows.
+        if (candidates is not self._candidates or
+                len(candidates) != len(self._keys)):
+            self._candidates = candidates
+            self._keys = [x['word'].lower() for x in candidates]
+        return self._keys
+
+
+_WORD_CHARS = frozenset(string.ascii_letters + string.digits + '_')
+
+
+def _get_runs(pattern: str) -> typing.List[str]:
+    # Note: The characters after a non word character must be contiguous.
+    runs: typing.List[str] = []
+    run = ''
+    for c in pattern:
+        run += c
+        if c in _WORD_CHARS:
+            runs.append(run)
+            run = ''
+    if run:
+        runs.append(run)
+    return runs
+
+
+def _match_runs(key: str, runs: typing.List[str], head: bool) -> bool:
+    pos = 0
+    for i, run in enumerate(runs):
+        if i == 0 and head:
+            if not key.startswith(run):
+                return False
+            pos = len(run)
+            continue
+        pos = key.find(run, pos)
+        if pos < 0:
+            return False
+        pos += len(run)
+    return True
+
+
+def _match_camel(word: str, key: str, runs: typing.List[str],
+                 uppers: typing.List[typing.List[typing.Tuple[int, str]]],
+                 head: bool) -> bool:
+    # Note: The lowercase characters are also matched with the uppercase.
+    if len(key) != len(word):
+        key = word.translate(_ASCII_LOWER)
+    pos = 0
+    for i, run in enumerate(runs):
+        pos = key.find(run, pos)
+        while pos >= 0 and not all(word[pos + j] == c
+                                   for j, c in uppers[i]):
+            if i == 0 and head:
+                return False
+            pos = key.find(run, pos + 1)
+        if pos < 0 or (i == 0 and head and pos != 0):
+            return False
+        pos += len(run)
+    return True
+
+
+_ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+SCORE_MATCH = 16
+SCORE_GAP_START = -3
+SCORE_GAP_EXTENSION = -1
+BONUS_BOUNDARY = 8
+BONUS_CAMEL = 7
+BONUS_CONSECUTIVE = 4
+BONUS_FIRST_CHAR_MULTIPLIER = 2
+
+
+def fuzzy_score(word: str, pattern: str) -> int:
+    """Score the fuzzy match like fzf.
+
+    The pattern must be lowercase.  The shortest match window is scored.
+    The matched characters after a non word character or a camel case hump
+    and the consecutive matches get the bonuses and the gaps are penalized.
+    """
+    key = word.lower()
+    if len(key) != len(word):
+        key = word.translate(_ASCII_LOWER)
+
+    # Find the end of the first match
+    end = -1
+    pattern_pos = 0
+    for i, c in enumerate(key):
+        if c == pattern[pattern_pos]:
+            pattern_pos += 1
+            if pattern_pos == len(pattern):
+                end = i + 1
+                break
+    if end < 0:
+        return 0
+
+    # Find the start of the shortest match
+    start = 0
+    pattern_pos = len(pattern) - 1
+    for i in range(end - 1, -1, -1):
+        if key[i] == pattern[pattern_pos]:
+            pattern_pos -= 1
+            if pattern_pos < 0:
+                start = i
+                break
+
+    score = 0
+    pattern_pos = 0
+    in_gap = False
+    consecutive = 0
+    first_bonus = 0
+    prev_class = _get_char_class(word[start - 1]) if start > 0 else 0
+    for i in range(start, end):
+        char_class = _get_char_class(word[i])
+        if pattern_pos < len(pattern) and key[i] == pattern[pattern_pos]:
+            bonus = _get_bonus(prev_class, char_class)
+            if consecutive == 0:
+                first_bonus = bonus
+            else:
+                if bonus == BONUS_BOUNDARY:
+                    first_bonus = bonus
+                bonus = max(bonus, first_bonus, BONUS_CONSECUTIVE)
+            if pattern_pos == 0:
+                bonus *= BONUS_FIRST_CHAR_MULTIPLIER
+            score += SCORE_MATCH + bonus
+            in_gap = False
+            consecutive += 1
+            pattern_pos += 1
+        else:
+            score += SCORE_GAP_EXTENSION if in_gap else SCORE_GAP_START
+            in_gap = True
+            consecutive = 0
+            first_bonus = 0
+        prev_class = char_class
+    return score
+
+
+def _get_char_class(c: str) -> int:
+    # 0: non word, 1: lower, 2: upper, 3: digit
+    if c.isupper():
+        return 2
+    if c.isdigit():
+        return 3
+    if c.isalpha():
+        return 1
+    return 0
+
+
+def _get_bonus(prev_class: int, char_class: int) -> int:
+    if char_class and not prev_class:
+        return BONUS_BOUNDARY
+    if (prev_class == 1 and char_class == 2) or (
+            prev_class != 3 and char_class == 3):
+        return BONUS_CAMEL
+    return 0
+
+
 def load_external_module(base: str, module: str) -> None:
     current = Path(base).parent.resolve()
     module_dir = str(current.parent.joinpath(module))
@@ -302,6 +639,99 @@ def binary_search_end(li: typing.List[Candidates], prefix: str) -> int:
     return -1
 
 
+def balance_loads(loads: typing.List[typing.Dict[str, float]],
+                  min_gain: float,
+                  fixed: typing.AbstractSet[str] = frozenset()
+                  ) -> typing.List[typing.Tuple[str, int, int]]:
+    """Plan the source moves to reduce the load of the busiest process.
+
+    `loads` is the list of {source name: cost} for each process.  The
+    sources in `fixed` are not moved.
+    It returns the list of (source name, from index, to index).
+    """
+    loads = [dict(x) for x in loads]
+    moves: typing.List[typing.Tuple[str, int, int]] = []
+    for _ in range(sum([len(x) for x in loads])):
+        totals = [sum(x.values()) for x in loads]
+        src = totals.index(max(totals))
+        dst = totals.index(min(totals))
+
+        best = ''
+        best_max = totals[src] - min_gain
+        for name, cost in loads[src].items():
+            if name in fixed:
+                continue
+            new_max = max(totals[src] - cost, totals[dst] + cost)
+            if new_max < best_max:
+                best = name
+                best_max = new_max
+        if not best:
+            break
+
+        loads[dst][best] = loads[src].pop(best)
+        moves.append((best, src, dst))
+    return moves
+
+
+LRUItem = typing.Tuple[typing.Any, int]
+
+
+class LRUCache(object):
+    """The cache which discards the least recently used items.
+
+    The items are discarded if the number of the items is greater than
+    `max_size` or the total weight of the items is greater than
+    `max_weight`.  `weight` returns the weight of the item.
+    """
+
+    def __init__(self, max_size: int, max_weight: int,
+                 weight: typing.Callable[[typing.Any], int]) -> None:
+        self.hits = 0
+        self.misses = 0
+
+        self._max_size = max_size
+        self._max_weight = max_weight
+        self._weight = weight
+        self._total_weight = 0
+        self._items: 'OrderedDict[typing.Hashable, LRUItem]' = (
+            OrderedDict())
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def get(self, key: typing.Hashable) -> typing.Optional[typing.Any]:
+        if key not in self._items:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._items.move_to_end(key)
+        return self._items[key][0]
+
+    def put(self, key: typing.Hashable, value: typing.Any) -> None:
+        if key in self._items:
+            self._total_weight -= self._items.pop(key)[1]
+        weight = self._weight(value)
+        self._items[key] = (value, weight)
+        self._total_weight += weight
+
+        while self._items and (len(self._items) > self._max_size or
+                               self._total_weight > self._max_weight):
+            self._total_weight -= self._items.pop(
+                next(iter(self._items)))[1]
+
+    def clear(self) -> None:
+        self._items.clear()
+        self._total_weight = 0
+
+    def get_stats(self) -> typing.Dict[str, int]:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self._items),
+            'weight': self._total_weight,
+        }
+
+
 def uniq_list_dict(li: typing.List[typing.Any]) -> typing.List[typing.Any]:
     # Uniq list of dictionaries
     ret: typing.List[typing.Any] = []
@@ -104,6 +104,52 @@ function! s:suite.custom_option() abort
         \ deoplete#custom#_get_option('camel_case'), v:true)
 endfunction
 
+function! s:suite.custom_option_version() abort
+  call deoplete#custom#_init()
+  call deoplete#custom#_init_buffer()
+  call deoplete#custom#option('ignore_sources', {'python': ['buffer']})
+  call deoplete#custom#_update_cache()
+  let prev_version = deoplete#custom#_get_options().version
+
+  " The nested dict options are changed in place
+  call deoplete#custom#option('ignore_sources', {'c': ['around']})
+  call deoplete#custom#_update_cache()
+  call s:assert.equals(
+        \ deoplete#custom#_get_options().version, prev_version + 1)
+  call s:assert.equals(
+        \ deoplete#custom#_get_option('ignore_sources'),
+        \ {'python': ['buffer'], 'c': ['around']})
+
+  " No changes
+  call deoplete#custom#_update_cache()
+  call s:assert.equals(
+        \ deoplete#custom#_get_options().version, prev_version + 1)
+endfunction
+
+function! s:suite.custom_version() abort
+  call deoplete#custom#_init()
+  call deoplete#custom#_update_cache()
+  let prev_version = deoplete#custom#_get_version()
+  let prev_options_version = deoplete#custom#_get_options().version
+
+  " No changes
+  call s:assert.equals(deoplete#custom#_get_version(), prev_version)
+
+  call deoplete#custom#source('_', 'matchers', ['matcher_head'])
+  call s:assert.equals(deoplete#custom#_get_version(), prev_version + 1)
+
+  " The custom dicts are changed in place
+  let custom_source = deoplete#custom#_get_source('_')
+  let custom_source.converters = []
+  call s:assert.equals(deoplete#custom#_get_version(), prev_version + 2)
+
+  " The versions are not reset
+  call deoplete#custom#_init()
+  call s:assert.true(deoplete#custom#_get_version() > prev_version + 2)
+  call s:assert.true(
+        \ deoplete#custom#_get_options().version > prev_options_version)
+endfunction
+
 function! s:suite.custom_filter() abort
   call deoplete#custom#_init()
   call deoplete#custom#filter('converter_auto_delimiter', {
@@ -0,0 +1,68 @@
+# ============================================================================
+# FILE: benchmark_fuzzy.py
+# AUTHOR: Shougo Matsushita <Shougo.Matsu at gmail.com>
+# License: MIT license
+# ============================================================================
+#
+# Compare the regexp fuzzy matching with deoplete.util.FuzzyMatcher.
+#
+#   python3 test/rplugin/python3/deoplete/benchmark_fuzzy.py [words]
+
+import random
+import re
+import string
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[4].joinpath(
+    'rplugin', 'python3')))
+
+from deoplete.util import FuzzyMatcher, fuzzy_escape  # noqa: E402
+
+
+def make_candidates(num):
+    random.seed(0)
+    chars = string.ascii_letters + '_'
+    return [{'word': ''.join(random.choice(chars)
+                             for _ in range(random.randint(4, 20)))}
+            for _ in range(num)]
+
+
+def regexp_filter(candidates, pattern, head):
+    p = re.compile(fuzzy_escape(pattern, False))
+    method = 'match' if head else 'search'
+    return [x for x in candidates
+            if getattr(p, method)(x['word'].lower())]
+
+
+def main():
+    num = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    candidates = make_candidates(num)
+    for pattern in ['a', 'ab', 'abc', 'fooba']:
+        for head in [True, False]:
+            old = regexp_filter(candidates, pattern, head)
+            new = FuzzyMatcher().filter(
+                candidates, pattern, True, False, head)
+            old_time = min(timeit.repeat(
+                lambda: regexp_filter(candidates, pattern, head),
+                number=1, repeat=5))
+            cold_time = min(timeit.repeat(
+                lambda: FuzzyMatcher().filter(
+                    candidates, pattern, True, False, head),
+                number=1, repeat=5))
+            # Note: The same candidates are filtered while the input grows.
+            matcher = FuzzyMatcher()
+            matcher.filter(candidates, pattern, True, False, head)
+            warm_time = min(timeit.repeat(
+                lambda: matcher.filter(
+                    candidates, pattern, True, False, head),
+                number=1, repeat=5))
+            print('{:6} head={:d} regexp {:7.2f}ms ({:6d})  '
+                  'matcher {:7.2f}ms / {:7.2f}ms ({:6d})'.format(
+                      pattern, head, old_time * 1000, len(old),
+                      cold_time * 1000, warm_time * 1000, len(new)))
+
+
+if __name__ == '__main__':
+    main()
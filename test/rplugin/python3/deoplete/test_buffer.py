@@ -0,0 +1,378 @@
+import os
+import queue
+import re
+import threading
+import time
+
+from deoplete.source import buffer
+from deoplete.source.buffer import Source
+
+
+class _Vim:
+    def __init__(self):
+        self.buffers = {}
+        self.changes = {}
+        self.current = 1
+        self.calls = []
+
+    def eval(self, expr):
+        return list(self.buffers)
+
+    def call(self, name, *args):
+        self.calls.append(name)
+        if name == 'deoplete#custom#_get_source_vars':
+            return {}
+        if name == 'deoplete#util#_attach_buffer':
+            self.changes[args[0]] = []
+            return True
+        if name == 'deoplete#util#_get_buffer_changes':
+            changes = self.changes[args[0]]
+            self.changes[args[0]] = []
+            return changes
+        if name == 'getbufline':
+            return self.buffers[args[0]]['lines'][args[1] - 1:args[2]]
+        if name == 'getbufvar':
+            if args[1] == '&modified':
+                return self.buffers[args[0]].get('modified', 1)
+            bufnr = self.current if args[0] == '%' else args[0]
+            return self.buffers[bufnr]['filetype']
+        if name == 'line':
+            return len(self.buffers[self.current]['lines'])
+        if name == 'line2byte':
+            return sum(len(x) + 1 for x
+                       in self.buffers[self.current]['lines']) + 1
+        if name == 'deoplete#util#_get_buffer_size':
+            buf = self.buffers[args[0]]
+            return buf.get('size', sum(len(x) + 1 for x in buf['lines']))
+        if name == 'tabpagebuflist':
+            return [self.current]
+        raise Exception(name)
+
+    def edit(self, bufnr, first, last, lines):
+        self.buffers[bufnr]['lines'][first:last] = lines
+        self.changes[bufnr].append([first, last, first + len(lines)])
+
+
+def _context(vim, event, bufnr=1):
+    filetype = vim.buffers[bufnr]['filetype']
+    return {
+        'event': event,
+        'bufnr': bufnr,
+        'bufpath': vim.buffers[bufnr].get('path', ''),
+        'keyword_pattern': r'\w+',
+        'filetypes': [filetype],
+        'same_filetypes': [],
+    }
+
+
+def _source(vim):
+    source = Source(vim)
+    source.vars['cache_size'] = 0
+    for bufnr in vim.buffers:
+        vim.current = bufnr
+        source.on_event(_context(vim, 'BufReadPost', bufnr))
+    vim.current = 1
+    return source
+
+
+def _words(source, vim, bufnr=1):
+    vim.current = bufnr
+    return [x['word'] for x in source.gather_candidates(
+        _context(vim, 'Manual', bufnr))['sorted_candidates'][0]]
+
+
+def _check_index(source):
+    source._merge_keys()
+    assert source._keys == sorted(source._keys)
+    assert sorted(x[1] for x in source._keys) == sorted(source._masks)
+    for buf in source._buffers.values():
+        counts = {}
+        for words in buf['lines']:
+            for word in words:
+                counts[word] = counts.get(word, 0) + 1
+        assert buf['words'] == counts
+        for word in buf['words']:
+            assert source._masks[word] & buf['bit']
+
+
+def test_merge_range():
+    f = Source(None)._merge_range
+
+    assert f([], 2, 4, 5) == [(2, 5)]
+    # Before the change
+    assert f([(0, 1)], 3, 4, 6) == [(0, 1), (3, 6)]
+    # After the change: it is shifted
+    assert f([(5, 7)], 1, 2, 4) == [(7, 9), (1, 4)]
+    assert f([(5, 7)], 1, 3, 1) == [(3, 5), (1, 1)]
+    # Overlapped
+    assert f([(2, 5)], 4, 6, 6) == [(2, 6)]
+    assert f([(2, 5)], 3, 4, 7) == [(2, 8)]
+    # Adjacent
+    assert f([(2, 4)], 4, 5, 5) == [(2, 5)]
+    assert f([(5, 6)], 3, 5, 5) == [(3, 6)]
+    # Deleted
+    assert f([(2, 4)], 1, 5, 1) == [(1, 1)]
+
+
+def test_update_lines():
+    vim = _Vim()
+    vim.buffers[1] = {'filetype': 'text', 'lines': [
+        'foo bar', 'Foo baz', 'qux',
+    ]}
+    source = _source(vim)
+    assert _words(source, vim) == ['bar', 'baz', 'Foo', 'foo', 'qux']
+
+    # Replace
+    vim.edit(1, 0, 1, ['hoge bar'])
+    assert _words(source, vim) == ['bar', 'baz', 'Foo', 'hoge', 'qux']
+    _check_index(source)
+
+    # Insert
+    vim.edit(1, 1, 1, ['new', 'qux'])
+    assert source._buffers[1]['words']['qux'] == 1
+    assert _words(source, vim) == [
+        'bar', 'baz', 'Foo', 'hoge', 'new', 'qux']
+    assert source._buffers[1]['words']['qux'] == 2
+    _check_index(source)
+
+    # Delete
+    vim.edit(1, 0, 3, [])
+    assert _words(source, vim) == ['baz', 'Foo', 'qux']
+    assert len(source._buffers[1]['lines']) == 2
+    _check_index(source)
+
+    # Many changes
+    vim.edit(1, 0, 0, ['a', 'b'])
+    vim.edit(1, 1, 3, ['c'])
+    vim.edit(1, 3, 3, ['d'])
+    assert vim.buffers[1]['lines'] == ['a', 'c', 'qux', 'd']
+    assert _words(source, vim) == ['a', 'c', 'd', 'qux']
+    _check_index(source)
+
+
+def test_buffer_mask():
+    vim = _Vim()
+    vim.buffers[1] = {'filetype': 'python', 'lines': ['foo common']}
+    vim.buffers[2] = {'filetype': 'c', 'lines': ['bar common']}
+    vim.buffers[3] = {'filetype': 'python', 'lines': ['baz']}
+    source = _source(vim)
+
+    assert _words(source, vim, 1) == ['baz', 'common', 'foo']
+    assert _words(source, vim, 2) == ['bar', 'common']
+
+    source.vars['require_same_filetype'] = False
+    assert _words(source, vim, 1) == ['bar', 'baz', 'common', 'foo']
+    _check_index(source)
+
+
+def test_buffer_bit():
+    vim = _Vim()
+    vim.buffers[1] = {'filetype': 'text', 'lines': ['foo common']}
+    vim.buffers[2] = {'filetype': 'text', 'lines': ['bar common']}
+    vim.buffers[3] = {'filetype': 'text', 'lines': ['baz']}
+    source = _source(vim)
+    # The other buffers are parsed one by one
+    assert _words(source, vim) == ['bar', 'common', 'foo']
+    assert _words(source, vim) == ['bar', 'baz', 'common', 'foo']
+    assert sorted(x['bit'] for x in source._buffers.values()) == [1, 2, 4]
+
+    # The bit is reused
+    bit = source._buffers[2]['bit']
+    source._remove_buffer(source._buffers[2])
+    assert source._masks['common'] == source._buffers[1]['bit']
+    assert 'bar' not in source._masks
+    _check_index(source)
+
+    vim.buffers[4] = {'filetype': 'text', 'lines': ['hoge']}
+    vim.current = 4
+    source.on_event(_context(vim, 'BufReadPost', 4))
+    assert _words(source, vim, 4) == ['baz', 'common', 'foo', 'hoge']
+    assert source._buffers[4]['bit'] == bit
+    _check_index(source)
+
+
+def test_remove_new_key():
+    vim = _Vim()
+    vim.buffers[1] = {'filetype': 'text', 'lines': ['foo', 'bar']}
+    source = _source(vim)
+    assert _words(source, vim) == ['bar', 'foo']
+
+    # The new keys are not merged yet
+    vim.edit(1, 1, 1, ['baz'])
+    source._update_cache(source._buffers[1], _context(vim, 'Manual'))
+    assert source._new_keys == [('baz', 'baz')]
+    vim.edit(1, 0, 2, [])
+    source._update_cache(source._buffers[1], _context(vim, 'Manual'))
+    assert not source._new_keys
+    _check_index(source)
+    assert _words(source, vim) == ['bar']
+
+
+def test_large_buffer():
+    vim = _Vim()
+    vim.buffers[1] = {'filetype': 'text', 'lines': ['foo']}
+    vim.buffers[2] = {'filetype': 'text', 'lines': ['bar'] * 100}
+    source = _source(vim)
+    source._limit = 100
+    source._max_lines = 10
+
+    # The large buffer is not got
+    vim.calls = []
+    assert _words(source, vim) == ['foo']
+    assert 2 not in source._buffers
+    assert vim.calls.count('getbufline') == 1
+
+    # The size is unknown: the lines are got until the limit
+    vim.buffers[2]['size'] = -1
+    vim.current = 2
+    source.on_event(_context(vim, 'BufReadPost', 2))
+    vim.calls = []
+    assert _words(source, vim) == ['foo']
+    assert 2 not in source._buffers
+    assert vim.calls.count('getbufline') == 3
+
+
+def _cache_source(tmp_path):
+    source = Source(_Vim())
+    source.vars['cache_directory'] = str(tmp_path.joinpath('cache'))
+    source._min_cache_lines = 0
+    path = tmp_path.joinpath('foo.txt')
+    path.write_text('foo bar\nbaz\n')
+    buf = {
+        'lines': [['foo', 'bar'], ['baz']],
+        'keyword_pattern': r'\w+',
+        'loader': None,
+        'is_large': False,
+        'is_truncated': False,
+    }
+    return source, str(path), buf
+
+
+def test_cache(tmp_path):
+    source, path, buf = _cache_source(tmp_path)
+    source._save_cache(buf, path)
+    assert source._load_cache(path, r'\w+') == buf['lines']
+
+    # The keyword pattern is changed
+    assert source._load_cache(path, r'[a-z]+') is None
+
+    # The mtime is changed
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    assert source._load_cache(path, r'\w+') is None
+    source._save_cache(buf, path)
+    assert source._load_cache(path, r'\w+') == buf['lines']
+
+    # The size is changed
+    os.truncate(path, 4)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    assert source._load_cache(path, r'\w+') is None
+
+    # The truncated buffer is not saved
+    os.remove(source._get_cache_path(path))
+    buf['is_truncated'] = True
+    source._save_cache(buf, path)
+    assert source._load_cache(path, r'\w+') is None
+
+
+def test_cache_format(tmp_path, monkeypatch):
+    source, path, buf = _cache_source(tmp_path)
+    source._save_cache(buf, path)
+    monkeypatch.setattr(buffer, 'CACHE_FORMAT', buffer.CACHE_FORMAT + 1)
+    assert source._load_cache(path, r'\w+') is None
+
+
+def test_evict_cache(tmp_path):
+    source = Source(_Vim())
+    for i, name in enumerate(['a', 'b', 'c', 'd']):
+        cache_path = tmp_path.joinpath(name + '.mpack')
+        cache_path.write_bytes(b'x' * 10)
+        # "c" is the least recently used
+        os.utime(str(cache_path), (0, [3, 4, 1, 2][i] * 100))
+
+    source._evict_cache(tmp_path, 40)
+    assert len(list(tmp_path.glob('*.mpack'))) == 4
+    source._evict_cache(tmp_path, 25)
+    assert sorted(x.name for x in tmp_path.glob('*.mpack')) == [
+        'a.mpack', 'b.mpack']
+
+
+def _loader_source(tmp_path):
+    path = tmp_path.joinpath('foo.txt')
+    path.write_text('\n'.join(f'foo{i} bar' for i in range(5)) + '\n')
+    vim = _Vim()
+    vim.buffers[1] = {'filetype': 'text', 'lines': ['hoge']}
+    vim.buffers[2] = {'filetype': 'text', 'lines': [],
+                      'path': str(path), 'modified': 0}
+    source = _source(vim)
+    source._chunk_lines = 2
+    return vim, source, str(path)
+
+
+def test_loader(tmp_path):
+    vim, source, path = _loader_source(tmp_path)
+
+    # The file is loaded in the background
+    assert _words(source, vim) == ['hoge']
+    buf = source._buffers[2]
+    buf['loader']['future'].result()
+
+    # A chunk is applied until the deadline
+    assert not source._update_loader(buf, 0)
+    assert buf['lines'] == [['foo0', 'bar'], ['foo1', 'bar']]
+    assert buf['loader']
+    assert source._update_loader(buf, time.monotonic() + 10)
+    assert not buf['loader']
+    assert len(buf['lines']) == 5
+    assert _words(source, vim) == [
+        'bar', 'foo0', 'foo1', 'foo2', 'foo3', 'foo4', 'hoge']
+    _check_index(source)
+
+
+def test_loader_cancel(tmp_path):
+    vim, source, path = _loader_source(tmp_path)
+    _words(source, vim)
+    loader = source._buffers[2]['loader']
+
+    # BufReadPost
+    vim.current = 2
+    source.on_event(_context(vim, 'BufReadPost', 2))
+    assert loader['cancel'].is_set()
+    assert 2 not in source._buffers
+
+    _words(source, vim, 1)
+    loader = source._buffers[2]['loader']
+
+    # The buffer is wiped
+    del vim.buffers[2]
+    source.on_event(_context(vim, 'InsertLeave', 1))
+    assert loader['cancel'].is_set()
+    assert 2 not in source._buffers
+
+    # The loading is stopped
+    cancel = threading.Event()
+    cancel.set()
+    chunks = queue.Queue()
+    assert not source._load_file(path, r'\w+', None, chunks, cancel, None)
+    assert chunks.empty()
+
+
+def test_loader_max_words(tmp_path):
+    vim, source, path = _loader_source(tmp_path)
+    source._max_words = 3
+
+    chunks = queue.Queue()
+    assert not source._load_file(
+        path, r'\w+', None, chunks, threading.Event(), None)
+    assert chunks.get_nowait() == [['foo0', 'bar'], ['foo1', 'bar']]
+    assert chunks.empty()
+
+
+def test_max_width():
+    source = Source(None)
+    source._max_width = 10
+    pattern = re.compile(r'\w+')
+
+    assert source._get_words(pattern, 'foo bar') == ['foo', 'bar']
+    # The last word may be cut
+    assert source._get_words(pattern, 'foo bar bazqux') == ['foo', 'bar']
@@ -0,0 +1,257 @@
+from concurrent import futures
+
+import msgpack
+
+from deoplete.child import Child
+from deoplete.parent import AsyncParent
+
+
+class _Matcher:
+    def __init__(self, name, is_monotonic=True):
+        self.name = name
+        self.is_monotonic = is_monotonic
+        self.inputs = []
+
+    def filter(self, context):
+        self.inputs.append(len(context['candidates']))
+        complete_str = context['complete_str']
+        if context['ignorecase']:
+            return [x for x in context['candidates']
+                    if x['word'].lower().startswith(complete_str.lower())]
+        return [x for x in context['candidates']
+                if x['word'].startswith(complete_str)]
+
+
+class _Source:
+    def __init__(self, matchers):
+        self.name = 'foo'
+        self.matchers = matchers
+        self.sorters = []
+        self.converters = []
+        self.matcher_key = ''
+        self.max_candidates = 0
+        self.smart_case = False
+        self.camel_case = False
+        self.ignore_case = True
+        self.mark = ''
+        self.dup = False
+
+
+def _child(*matchers):
+    child = Child(None)
+    child._options = {'option': {'max_list': 0}, 'buffer_option': {}}
+    for f in matchers:
+        child._filters[f.name] = f
+    source = _Source([x.name for x in matchers])
+    candidates = [{'word': x} for x in [
+        'foo', 'fooBar', 'foobar', 'fxx', 'bar', 'baz',
+    ]]
+    result = {
+        'name': source.name,
+        'source': source,
+        'is_async': False,
+        'candidates': candidates,
+        'context': {
+            'char_position': 0,
+            'candidates': candidates,
+            'custom': {'source': {}},
+        },
+    }
+    return child, source, result
+
+
+def _set_candidates(result, candidates):
+    result['candidates'] = candidates
+    result['context']['candidates'] = candidates
+
+
+def _words(child, result, complete_str):
+    [candidates, _] = child._get_candidates(
+        result, complete_str, '', False, 0)
+    return [x['word'] for x in candidates]
+
+
+def test_narrowing():
+    m = _Matcher('m')
+    child, source, result = _child(m)
+
+    # The input is extended: the previous matches are narrowed
+    assert _words(child, result, 'f') == ['foo', 'fooBar', 'foobar', 'fxx']
+    assert _words(child, result, 'fo') == ['foo', 'fooBar', 'foobar']
+    assert _words(child, result, 'foob') == ['fooBar', 'foobar']
+    assert m.inputs == [6, 4, 3]
+
+    # Backspace
+    assert _words(child, result, 'fo') == ['foo', 'fooBar', 'foobar']
+    assert m.inputs[-1] == 6
+
+    # Not prefix
+    assert _words(child, result, 'ba') == ['bar', 'baz']
+    assert m.inputs[-1] == 6
+    assert _words(child, result, 'bar') == ['bar']
+    assert m.inputs[-1] == 2
+
+    # The candidates are changed
+    _set_candidates(result, result['candidates'] + [{'word': 'barx'}])
+    assert _words(child, result, 'bar') == ['bar', 'barx']
+    assert m.inputs[-1] == 7
+
+
+def test_narrowing_case():
+    m = _Matcher('m')
+    child, source, result = _child(m)
+    source.smart_case = True
+
+    assert _words(child, result, 'foo') == ['foo', 'fooBar', 'foobar']
+    # The input has upper case: ignorecase is changed
+    assert _words(child, result, 'fooB') == ['fooBar']
+    assert m.inputs == [6, 6]
+
+
+def test_narrowing_matchers():
+    m1 = _Matcher('m1')
+    m2 = _Matcher('m2')
+    child, source, result = _child(m1, m2)
+    source.matchers = ['m1']
+
+    assert _words(child, result, 'f') == ['foo', 'fooBar', 'foobar', 'fxx']
+    # The matchers are changed
+    source.matchers = ['m1', 'm2']
+    assert _words(child, result, 'fo') == ['foo', 'fooBar', 'foobar']
+    assert m1.inputs == [6, 6]
+
+    # Not monotonic matcher
+    m2.is_monotonic = False
+    assert _words(child, result, 'f') == ['foo', 'fooBar', 'foobar', 'fxx']
+    assert _words(child, result, 'fo') == ['foo', 'fooBar', 'foobar']
+    assert m1.inputs == [6, 6, 6, 6]
+
+
+def test_narrowing_truncated():
+    m = _Matcher('m')
+    child, source, result = _child(m)
+    source.max_candidates = 2
+
+    # The previous matches are truncated by max_candidates
+    assert _words(child, result, 'f') == ['foo', 'fooBar']
+    assert _words(child, result, 'fo') == ['foo', 'fooBar']
+    assert m.inputs == [6, 6]
+
+
+def test_superseded():
+    child = Child(None)
+
+    def merge(bufnr):
+        return {'name': 'merge_results', 'args': [{'bufnr': bufnr}]}
+
+    def event(name):
+        return {'name': 'on_event', 'args': [{'event': name}]}
+
+    child_ins = [
+        merge(1),
+        event('InsertEnter'),
+        merge(2),
+        merge(1),
+        event('BufWritePost'),
+        merge(1),
+        merge(2),
+        event('InsertLeave'),
+    ]
+    superseded = child._get_superseded(child_ins)
+    # Only the stale merge_results of the same buffer are skipped
+    assert superseded == {0, 2, 3}
+    assert all(child_ins[i]['name'] == 'merge_results' for i in superseded)
+    # The events are never dropped
+    assert not superseded & {1, 4, 7}
+
+    assert child._get_superseded([merge(1), merge(2)]) == set()
+    assert child._get_superseded([event('InsertEnter')] * 2) == set()
+
+
+def test_context_delta():
+    parent = AsyncParent.__new__(AsyncParent)
+    parent._sent_context = {}
+    child = Child(None)
+
+    def send(context):
+        encoded = parent._encode_context(context)
+        return (encoded,
+                child._decode_context(msgpack.unpackb(msgpack.packb(encoded))))
+
+    custom = {'source': {'_': {}}}
+    context = {
+        'input': 'f', 'filetype': 'python', 'bufnr': 1,
+        'custom_version': 1, 'custom': custom,
+    }
+    [encoded, decoded] = send(context)
+    assert decoded == context
+    assert 'custom' in encoded['delta']
+
+    # Added, changed and removed keys
+    context = {
+        'input': 'fo', 'filetype': 'python',
+        'custom_version': 1, 'custom': custom, 'sources': ['buffer'],
+    }
+    [encoded, decoded] = send(context)
+    assert decoded == context
+    assert encoded['delta'] == {'input': 'fo', 'sources': ['buffer']}
+    assert encoded['removed'] == ['bufnr']
+
+    # "custom" is sent only if "custom_version" is changed
+    custom = {'source': {'_': {'matchers': ['matcher_head']}}}
+    context = dict(context, custom=custom)
+    [encoded, decoded] = send(context)
+    assert 'custom' not in encoded['delta']
+    assert decoded['custom'] == {'source': {'_': {}}}
+
+    context = dict(context, custom_version=2)
+    [encoded, decoded] = send(context)
+    assert encoded['delta'] == {'custom_version': 2, 'custom': custom}
+    assert decoded == context
+
+    # The decoded context can be changed by the sources
+    decoded['input'] = 'bar'
+    [encoded, decoded] = send(context)
+    assert encoded['delta'] == {}
+    assert decoded == context
+
+
+def test_deferred_events():
+    class _Vim:
+        vars = {}
+
+    class _EventSource(_Source):
+        def __init__(self, name):
+            super().__init__([])
+            self.name = name
+            self.events = None
+            self.filetypes = []
+            self.received = []
+
+        def on_event(self, context):
+            self.received.append(context['event'])
+
+    child = Child(_Vim())
+    slow = _EventSource('slow')
+    fast = _EventSource('fast')
+    child._sources = {'slow': slow, 'fast': fast}
+    child._itersource = lambda context: child._sources.items()
+
+    gathering = futures.Future()
+    child._running['slow'] = gathering
+
+    # The running source does not block the events
+    child._on_event({'event': 'InsertEnter'})
+    child._on_event({'event': 'BufWritePost'})
+    assert fast.received == ['InsertEnter', 'BufWritePost']
+    assert slow.received == []
+
+    child._flush_events()
+    assert slow.received == []
+
+    # The events are delivered in order after the gathering
+    child._running.pop('slow')
+    child._on_event({'event': 'InsertLeave'})
+    assert slow.received == ['InsertEnter', 'BufWritePost', 'InsertLeave']
+    assert fast.received == ['InsertEnter', 'BufWritePost', 'InsertLeave']
+    assert not child._deferred_events
@@ -39,3 +39,21 @@ def test_filter():
     assert expected_candidates == Filter.filter_attrs(
         candidates_copy, preferred_order
     )
+
+
+class _Vim:
+    def call(self, name, *args):
+        # Note: The options must be read from the context.
+        assert name == 'deoplete#custom#_get_filter'
+        return {'attrs_order': {'fruit': {'kind': ['Fruit']}}}
+
+
+def test_max_list():
+    f = Filter(_Vim())
+
+    ctx = {
+        'filetype': 'fruit',
+        'max_list': 1,
+        'candidates': candidates[:],
+    }
+    assert f.filter(ctx) == [{'word': 'Apple', 'kind': 'Fruit'}]
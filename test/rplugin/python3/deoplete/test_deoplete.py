@@ -0,0 +1,83 @@
+from deoplete.deoplete import Deoplete
+
+
+class _Vim:
+    def __init__(self):
+        self.vars = {'deoplete#_logging': False}
+        self.options = {'runtimepath': ''}
+
+    def call(self, name, *args):
+        if name == 'deoplete#custom#_get_options':
+            return {
+                'version': 1,
+                'option': {
+                    'candidate_marks': [],
+                    'max_list': 0,
+                    'num_processes': 1,
+                },
+                'buffer_option': {},
+            }
+        return None
+
+
+class _Context:
+    def get(self, event):
+        return {'event': event, 'rpc': 'deoplete_on_event',
+                'custom_version': 0}
+
+
+class _Parent:
+    def __init__(self):
+        self.inputs = []
+        self.events = []
+
+    def merge_results(self, context):
+        self.inputs.append((context['input'], context['next_input'],
+                            context['filetype']))
+        return (False, False, [{
+            'complete_position': 0,
+            'rank': 100,
+            'candidates': [{'word': context['input'] + 'bar'}],
+        }])
+
+    def on_event(self, context):
+        self.events.append(context['event'])
+
+
+def _context(input, next_input='', filetype='python'):
+    return {
+        'bufnr': 1, 'position': [0, 1, 1, 0], 'event': 'TextChangedI',
+        'input': input, 'next_input': next_input, 'filetype': filetype,
+    }
+
+
+def test_results_cache():
+    deoplete = Deoplete(_Vim())
+    parent = _Parent()
+    deoplete._parents = [parent]
+    deoplete._context = _Context()
+    deoplete._custom_version = 0
+
+    assert deoplete._merge_results(_context('foo'))[3] == [
+        {'word': 'foobar'}]
+    assert deoplete._merge_results(_context('foo'))[3] == [
+        {'word': 'foobar'}]
+    assert len(parent.inputs) == 1
+
+    # The key separates filetype and next_input
+    deoplete._merge_results(_context('foo', filetype='c'))
+    deoplete._merge_results(_context('foo', next_input=')'))
+    assert parent.inputs == [
+        ('foo', '', 'python'), ('foo', '', 'c'), ('foo', ')', 'python')]
+    deoplete._merge_results(_context('foo', next_input=')'))
+    assert len(parent.inputs) == 3
+
+    # Manual completion does not use the cache
+    deoplete._merge_results(dict(_context('foo'), event='Manual'))
+    assert len(parent.inputs) == 4
+
+    # The cache is cleared by the events
+    deoplete.on_event({'event': 'BufWritePost'})
+    assert parent.events == ['BufWritePost']
+    deoplete._merge_results(_context('foo'))
+    assert len(parent.inputs) == 5
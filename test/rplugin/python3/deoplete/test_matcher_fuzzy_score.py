@@ -0,0 +1,52 @@
+from deoplete.filter.matcher_fuzzy_score import Filter
+
+
+def _ctx(complete_str, max_candidates=0):
+    _candidates = [
+        { 'word': 'afoobar' },
+        { 'word': 'xfxoxbxr' },
+        { 'word': 'foobar' },
+        { 'word': 'foo_bar' },
+        { 'word': 'fooBar' },
+        { 'word': 'baz' },
+    ]
+
+    return {
+        'complete_str'   : complete_str,
+        'ignorecase'     : True,
+        'camelcase'      : True,
+        'is_sorted'      : False,
+        'max_candidates' : max_candidates,
+        'candidates'     : _candidates,
+    }
+
+
+def test_matcher_fuzzy_score():
+    f = Filter(None)
+
+    assert f.name == 'matcher_fuzzy_score'
+    assert f.description == 'scored fuzzy matcher'
+
+    ctx = _ctx('')
+    assert f.filter(ctx) == ctx['candidates']
+
+    ctx = _ctx('fb')
+    assert f.filter(ctx) == [
+        { 'word': 'fooBar' },
+        { 'word': 'foo_bar' },
+        { 'word': 'foobar' },
+        { 'word': 'afoobar' },
+        { 'word': 'xfxoxbxr' },
+    ]
+
+    ctx = _ctx('fb', max_candidates=2)
+    assert f.filter(ctx) == [
+        { 'word': 'fooBar' },
+        { 'word': 'foo_bar' },
+    ]
+
+    # The narrowed results are same with the full results
+    ctx = _ctx('f')
+    narrowed = _ctx('fb')
+    narrowed['candidates'] = f.filter(ctx)[::-1]
+    assert f.filter(narrowed) == f.filter(_ctx('fb'))
@@ -0,0 +1,45 @@
+from queue import Queue
+
+from deoplete.parent import AsyncParent
+
+
+class _Vim:
+    def __init__(self):
+        self.errors = []
+
+    def async_call(self, fn, *args):
+        fn(*args)
+
+
+def _parent(on_exit=None):
+    parent = AsyncParent.__new__(AsyncParent)
+    parent._vim = _Vim()
+    parent._options = {'option': {}, 'buffer_option': {}}
+    parent._on_exit = on_exit
+    parent._is_exited = False
+    parent._hnd = object()
+    parent._futures = {}
+    parent._shared_dirs = set()
+    parent._queue_err = Queue()
+    parent._print_error = parent._vim.errors.append
+    return parent
+
+
+def test_exited():
+    parent = _parent()
+    parent._queue_err.put('stderr from child process:foo')
+    parent._exited()
+    # The errors are reported after the exit
+    assert parent._vim.errors == [
+        'stderr from child process:foo', 'The child process is exited!']
+    assert parent._get(1) == []
+
+    # It is reported only once
+    parent._exited()
+    assert len(parent._vim.errors) == 2
+
+    exited = []
+    parent = _parent(exited.append)
+    parent._exited()
+    assert exited == [parent]
+    assert parent._vim.errors == []
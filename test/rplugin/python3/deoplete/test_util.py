@@ -67,3 +67,118 @@ def test_uniq_list_dict():
         {'word': 'bar'},
         {'word': 'baz'}
     ]
+
+
+def test_filetype_option():
+    options = {
+        'option': {'sources': {'_': ['buffer'], 'python': ['jedi']}},
+        'buffer_option': {},
+    }
+    assert util.get_filetype_option(
+        options, 'sources', 'python', []) == ['jedi']
+    assert util.get_filetype_option(
+        options, 'sources', 'python.django', []) == ['jedi']
+    assert util.get_filetype_option(
+        options, 'sources', 'vim', []) == ['buffer']
+    options['buffer_option'] = {'sources': ['around']}
+    assert util.get_filetype_option(
+        options, 'sources', 'python', []) == ['around']
+
+
+def test_column_candidates():
+    candidates = util.ColumnCandidates(['bar', 'baz', 'foo'])
+    assert len(candidates) == 3
+    assert candidates[0] == {'word': 'bar'}
+    assert candidates[-1] == {'word': 'foo'}
+    assert candidates[1:] == [{'word': 'baz'}, {'word': 'foo'}]
+    assert list(candidates) == [
+        {'word': 'bar'}, {'word': 'baz'}, {'word': 'foo'}]
+    assert util.binary_search_begin(candidates, 'ba') == 0
+    assert util.binary_search_end(candidates, 'ba') == 1
+
+    candidates = util.ColumnCandidates(['foo', 'bar'], menu=['[A]', '[B]'])
+    assert candidates[1] == {'word': 'bar', 'menu': '[B]'}
+    assert [{'word': 'baz'}] + candidates == [
+        {'word': 'baz'},
+        {'word': 'foo', 'menu': '[A]'},
+        {'word': 'bar', 'menu': '[B]'},
+    ]
+
+
+def test_balance_loads():
+    assert util.balance_loads([], 0) == []
+    assert util.balance_loads([{'a': 1.0}, {'b': 1.0}], 0) == []
+    assert util.balance_loads(
+        [{'a': 5.0, 'b': 4.0, 'c': 1.0}, {}], 0) == [('a', 0, 1)]
+    assert util.balance_loads(
+        [{'a': 5.0, 'b': 4.0}, {'c': 1.0}], 0) == [('b', 0, 1)]
+    # Too small gain
+    assert util.balance_loads(
+        [{'a': 0.010, 'b': 0.002}, {'c': 0.009}], 0.005) == []
+    # Fixed sources
+    assert util.balance_loads(
+        [{'a': 5.0, 'b': 4.0}, {'c': 1.0}], 0, {'b', 'c'}) == [('a', 0, 1)]
+    assert util.balance_loads(
+        [{'a': 5.0, 'b': 4.0, 'c': 1.0}, {}], 0, {'a', 'b', 'c'}) == []
+
+
+def test_pack_candidates():
+    candidates = [
+        {'word': 'foo', 'menu': '[A]', 'icase': 1, 'equal': True},
+        {'word': 'bar', 'menu': '[B]', 'icase': 1, 'equal': 1},
+    ]
+    packed = util.pack_candidates(candidates)
+    assert packed['columns'] == {
+        'word': ['foo', 'bar'], 'menu': ['[A]', '[B]'],
+        'equal': [True, 1]}
+    assert packed['constants'] == {'icase': 1}
+    assert list(util.unpack_candidates(packed)) == candidates
+    assert util.unpack_candidates(packed)[1:] == candidates[1:]
+
+    # Different keys are not packed
+    candidates = [{'word': 'foo'}, {'word': 'bar', 'menu': '[B]'}]
+    assert util.pack_candidates(candidates) == candidates
+    assert util.unpack_candidates(candidates) == candidates
+
+
+def test_lru_cache():
+    cache = util.LRUCache(2, 10, len)
+    cache.put('a', [1])
+    cache.put('b', [1, 2])
+    assert cache.get('a') == [1]
+    cache.put('c', [1, 2, 3])
+    # "b" is the least recently used
+    assert cache.get('b') is None
+    assert cache.get('a') == [1]
+    assert cache.get_stats() == {
+        'hits': 2, 'misses': 1, 'size': 2, 'weight': 4}
+
+    # Discarded by the weight
+    cache.put('d', list(range(10)))
+    assert len(cache) == 1
+    assert cache.get('d') == list(range(10))
+    cache.clear()
+    assert cache.get('d') is None
+
+
+def test_fuzzy_matcher():
+    matcher = util.FuzzyMatcher()
+    candidates = [{'word': x} for x in
+                  ['foobar', 'afoobar', 'fooBar', 'foo.bar', 'foo_bar']]
+
+    def words(pattern, ignorecase, camelcase, head):
+        return [x['word'] for x in matcher.filter(
+            candidates, pattern, ignorecase, camelcase, head)]
+
+    assert words('fb', True, False, True) == [
+        'foobar', 'fooBar', 'foo.bar', 'foo_bar']
+    assert words('fb', True, False, False) == [
+        'foobar', 'afoobar', 'fooBar', 'foo.bar', 'foo_bar']
+    assert words('fB', False, True, True) == ['fooBar']
+    assert words('fb', False, True, True) == [
+        'foobar', 'foo.bar', 'foo_bar']
+    assert words('o.b', True, False, False) == ['foo.bar']
+    assert words('aob', True, False, False) == ['afoobar']
+    assert words('ob', True, False, True) == []
+    assert matcher.filter([{'word': 'aab'}], 'ab', True, False, True)
+    assert matcher.filter(candidates, '', True, False, True) == candidates